@@ -1,17 +1,30 @@
 import streamlit as st
 import os
+import time
+import queue
 import asyncio
-import nest_asyncio
+import threading
+import functools
+import weakref
+from datetime import datetime
 from dotenv import load_dotenv
-import semantic_kernel as sk
-from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
-from semantic_kernel.functions import KernelArguments
-from mock_data import generate_mock_emails, knowledge_base
-
-# --- 0. CRITICAL FIX FOR ASYNC LOOPS ---
-nest_asyncio.apply()
+from mock_data import iter_mock_emails, knowledge_base, policy_versions
+from llm_cache import LLMCache, cached_invoker, cached_streamer
+from semantic_index import SemanticIndex
+from policy_store import PolicyStore, PolicyVersion
+from prefetch import PrefetchScheduler, PENDING, CLASSIFYING, FAILED
+from pre_classifier import PreClassifier
+from triage_kernel import triage_function, get_deployment_name
+from tracing import tracer, estimate_tokens
+from inbox_view import InboxView, DEFAULT_PAGE_SIZE
+from inbox_store import InboxStore, intern_analysis
+from stage_memo import StageMemo
+from draft_history import DraftHistory, REFINE, EDIT, REDRAFT
+from kb_index import KnowledgeIndex, topic_of
 
 # --- 1. CONFIG & SETUP ---
+_rerun_started = time.time_ns()
+TRACE_PATH = os.getenv("TRIAGEFLOW_TRACE_PATH", "triageflow_trace.json")
 st.set_page_config(layout="wide", page_title="Outlook | TriageFlow", page_icon="📧")
 load_dotenv()
 
@@ -32,118 +45,298 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- 3. SEMANTIC KERNEL SETUP ---
+# The kernel (SDK import, connector, TriagePlugin prompts from triage_kernel.py, shared with main.py)
+# is built on the first LLM call that misses the cache, not while the page first renders.
+
+# Persistent LLM result cache, shared by every session (and with main.py via the same file)
 @st.cache_resource
-def setup_kernel():
-    kernel = sk.Kernel()
-    kernel.add_service(
-        AzureChatCompletion(
-            service_id="default",
-            deployment_name=os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o"),
-            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_KEY")
-        )
-    )
-    
-    # 1. CLASSIFIER
-    kernel.add_function(
-        prompt="""Analyze email. Subject: {{$subject}} Body: {{$body}}. 
-        Rules:
-        - Sales/Marketing -> 'Spam'
-        - Informational/No Task -> 'FYI'
-        - Casual/No Deadline -> 'Low'
-        - Deadline/Crisis/Approval -> 'High'
-        Return ONLY: "Urgency: [High/Low] | Intent: [Action/FYI/Spam]" """,
-        function_name="ClassifyEmail", plugin_name="TriagePlugin"
-    )
-
-    # 2. DRAFTER
-    kernel.add_function(
-        prompt="Exec Asst. Email: {{$body}} Context: {{$context}} Draft reply in STYLE: {{$style}}.",
-        function_name="DraftReply", plugin_name="TriagePlugin"
-    )
-    
-    # 3. REFINER
-    kernel.add_function(
-        prompt="Rewrite this draft based on feedback. \nOriginal: {{$previous_draft}}\nFeedback: {{$feedback}}\nNew Draft:",
-        function_name="RefineDraft", plugin_name="TriagePlugin"
-    )
-    
-    # 4. DELEGATOR
-    kernel.add_function(
-        prompt="Extract task: {{$body}}. Format: 'Task: [Action] | Who: [Role] | Due: [Time]'",
-        function_name="ExtractTask", plugin_name="TriagePlugin"
-    )
-    return kernel
+def get_llm_cache():
+    return LLMCache()
+
+llm_cache = get_llm_cache()
+
+# Retrieval index over the KB topics, compiled once per server process
+@st.cache_resource
+def get_kb_index():
+    return KnowledgeIndex(knowledge_base)
 
-kernel = setup_kernel()
+kb_index = get_kb_index()
+
+# Local embedding matrix for semantic matches ("acquisition rumors" -> Merger), memory-mapped from disk
+@st.cache_resource
+def get_semantic_index():
+    return SemanticIndex.load_or_build(knowledge_base)
+
+semantic_index = get_semantic_index()
+
+# Dated policy versions; the active one per topic is a binary search, not a string heuristic
+@st.cache_resource
+def get_policy_store():
+    return PolicyStore.from_knowledge_base(knowledge_base, policy_versions)
+
+policy_store = get_policy_store()
+
+# Local first-stage classifier: confident Spam/FYI skips the GPT-4o call
+@st.cache_resource
+def get_pre_classifier():
+    return PreClassifier.load_or_train()
+
+pre_classifier = get_pre_classifier()
+
+# Stage outputs keyed on their exact inputs: a style change or policy update re-runs only what it touches
+@st.cache_resource
+def get_stage_memo():
+    return StageMemo()
+
+stage_memo = get_stage_memo()
+DEPLOYMENT_NAME = get_deployment_name()
+invoke_llm = cached_invoker(llm_cache, DEPLOYMENT_NAME)
+# Streams chunks to a callback (the UI) and returns (text, ttft/total timings)
+stream_invoke = cached_streamer(llm_cache, DEPLOYMENT_NAME)
 
 # --- 4. ASYNC HELPER ---
+# One event loop lives for the whole server process on a daemon thread.
+# Streamlit reruns submit coroutines to it instead of spinning up (or nesting) loops,
+# so the Azure client's connections stay bound to a single loop.
+@st.cache_resource
+def get_event_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="triageflow-loop", daemon=True).start()
+    return loop
+
 def run_async(coroutine):
-    loop = asyncio.get_event_loop()
-    return loop.run_until_complete(coroutine)
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result()
+
+async def timed_invoke(func, arguments):
+    """Invokes a TriagePlugin function (through the LLM cache) and returns (text, elapsed_ms)."""
+    start = time.perf_counter()
+    result = await invoke_llm(func, arguments)
+    return result, (time.perf_counter() - start) * 1000
+
+async def traced(stage, coroutine):
+    with tracer.span(stage):
+        return await coroutine
+
+def stream_to_ui(make_coroutine):
+    """Runs make_coroutine(on_token) on the shared loop; returns (token generator for st.write_stream, future)."""
+    tokens = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(make_coroutine(tokens.put), get_event_loop())
+    def drain():
+        while True:
+            try:
+                yield tokens.get(timeout=0.05)
+            except queue.Empty:
+                if future.done() and tokens.empty(): return
+    return drain(), future
 
 # --- 5. LOGIC PIPELINE ---
-def agent_pipeline(email_obj, current_style):
-    # 1. Classify
-    classify_func = kernel.plugins["TriagePlugin"]["ClassifyEmail"]
-    cls_str = str(run_async(kernel.invoke(classify_func, KernelArguments(subject=email_obj["subject"], body=email_obj["body"]))))
-
-    # 2. Context (RAG)
-    hits = []
-    temporal_lock = False
-    for k, v in knowledge_base.items():
-        if k.split("(")[0].strip() in email_obj["body"]:
-            if "OLD POLICY" in v: continue 
-            if "ACTIVE" in v or "2025" in k:
-                hits.append(f"✅ {k}: {v}")
+async def agent_pipeline_async(email_obj, current_style, on_draft_token=None, threads=None):
+    """threads: the inbox's ThreadIndex; when given, prompts get the de-duplicated body plus a thread summary."""
+    with tracer.span("pipeline", email_id=email_obj["id"]):
+        return await _agent_pipeline(email_obj, current_style, on_draft_token, threads)
+
+async def _agent_pipeline(email_obj, current_style, on_draft_token, threads):
+    started = time.perf_counter()
+    latency_ms = {}
+    reused = []
+    # Quoted history already seen in the thread is dropped from every prompt
+    prompt_email = threads.compact(email_obj) if threads else email_obj
+    body = prompt_email["body"]
+    prompt_tokens = {"full": 0, "compact": 0}
+
+    async def memoized(stage, inputs, compute):
+        # Each stage is keyed on exactly what it reads; unchanged inputs reuse the last output
+        value, hit = await stage_memo.run(stage, inputs, compute)
+        if hit: reused.append(stage)
+        return value
+
+    # 1. Classify (gates the rest of the DAG); obvious noise is settled locally
+    async def classify():
+        cls = pre_classifier.triage(email_obj)
+        if cls is not None:
+            return cls, True
+        cls, _ = await timed_invoke(triage_function("ClassifyEmail"), {"subject": email_obj["subject"], "body": body})
+        return cls, False
+
+    with tracer.span("classify") as span:
+        classify_start = time.perf_counter()
+        cls_str, pre_classified = await memoized("classify", {"subject": email_obj["subject"], "body": email_obj["body"], "prompt_body": body}, classify)
+        latency_ms["classify"] = (time.perf_counter() - classify_start) * 1000
+        span.set(pre_classified=pre_classified, memo_hit="classify" in reused)
+        if not pre_classified:
+            prompt_tokens["full"] += estimate_tokens(email_obj["body"])
+            prompt_tokens["compact"] += estimate_tokens(body)
+
+    # 2. Context (RAG): topic matching depends on the text only, the context on the policies in force
+    def match_topics():
+        topics = kb_index.lookup(body)
+        return topics + [k for k, _ in semantic_index.search(body) if k not in topics]
+
+    with tracer.span("retrieve") as span:
+        rag_start = time.perf_counter()
+        topics = await memoized("topics", {"body": body}, match_topics)
+        hits = []
+        temporal_lock = False
+        for policy in policy_store.resolve(topics):
+            if policy_store.is_versioned(policy.topic):
+                hits.append(f"✅ {policy.key}: {policy.text}")
                 temporal_lock = True
             else:
-                hits.append(f"🔹 {k}: {v}")
-    context_str = "\n".join(hits) if hits else "ℹ️ No specific policy found."
+                hits.append(f"🔹 {policy.key}: {policy.text}")
+        context_str = "\n".join(hits) if hits else "ℹ️ No specific policy found."
+        if prompt_email.get("thread"):
+            context_str += f"\n🧵 {prompt_email['thread']}"
+        latency_ms["retrieve"] = (time.perf_counter() - rag_start) * 1000
+        span.set(topics=len(hits))
     
-    # 3. Logic Branching
-    draft_str = ""
-    delegate_str = ""
+    # 3. Logic Branching: Draft and Delegate are independent, so they run together
+    branches = {}
     
     if "Spam" not in cls_str:
-        draft_func = kernel.plugins["TriagePlugin"]["DraftReply"]
-        draft_str = str(run_async(kernel.invoke(draft_func, KernelArguments(body=email_obj["body"], context=context_str, style=current_style))))
+        draft_func = triage_function("DraftReply")
+        draft_args = {"body": body, "context": context_str, "style": current_style}
+        branches["draft"] = traced("draft", memoized("draft", draft_args, lambda: stream_invoke(draft_func, draft_args, on_draft_token)))
+        prompt_tokens["full"] += estimate_tokens(email_obj["body"])
+        prompt_tokens["compact"] += estimate_tokens(body) + estimate_tokens(prompt_email.get("thread"))
     
     if "High" in cls_str or "Action" in cls_str:
-        del_func = kernel.plugins["TriagePlugin"]["ExtractTask"]
-        delegate_str = str(run_async(kernel.invoke(del_func, KernelArguments(body=email_obj["body"]))))
+        del_func = triage_function("ExtractTask")
+        branches["delegate"] = traced("delegate", memoized("delegate", {"body": body}, lambda: timed_invoke(del_func, {"body": body})))
+        prompt_tokens["full"] += estimate_tokens(email_obj["body"])
+        prompt_tokens["compact"] += estimate_tokens(body)
+
+    outputs = dict(zip(branches, await asyncio.gather(*branches.values())))
+    stream_timings = []
+    if "draft" in outputs:
+        if "draft" in reused:
+            if on_draft_token: on_draft_token(outputs["draft"][0])
+            latency_ms["draft"] = 0.0
+        else:
+            latency_ms["draft"] = outputs["draft"][1]["total_ms"]
+            stream_timings.append({"stage": "draft", **outputs["draft"][1]})
+    if "delegate" in outputs:
+        latency_ms["delegate"] = 0.0 if "delegate" in reused else outputs["delegate"][1]
+    latency_ms["total"] = (time.perf_counter() - started) * 1000
 
     return {
         "class": cls_str, 
+        "pre_classified": pre_classified,
         "context": context_str, 
-        "draft": draft_str, 
-        "delegate": delegate_str, 
+        "topics": topics, # retrieved KB keys: a policy update re-runs only the emails that depend on it
+        "style": current_style,
+        "draft": outputs.get("draft", ("", 0))[0], 
+        "delegate": outputs.get("delegate", ("", 0))[0], 
         "temporal_lock": temporal_lock,
         "status": "active",
         "resolution_msg": "",
-        "version": 0 # <--- NEW: Tracks Draft Versions
+        "version": 0, # <--- NEW: Tracks Draft Versions
+        "reused": reused, # stages answered from the stage memo
+        "latency_ms": {stage: round(ms, 1) for stage, ms in latency_ms.items()},
+        "prompt_tokens": prompt_tokens, # email text sent to the LLM, with and without thread de-duplication
+        "stream_timings": stream_timings # TTFT/total per streamed call (draft, then each refine)
     }
 
-def refine_draft_logic(previous_draft, user_feedback):
-    func = kernel.plugins["TriagePlugin"]["RefineDraft"]
-    return str(run_async(kernel.invoke(func, KernelArguments(previous_draft=previous_draft, feedback=user_feedback))))
+def agent_pipeline(email_obj, current_style):
+    return run_async(agent_pipeline_async(email_obj, current_style))
+
+async def redraft_async(email_obj, analysis, current_style, reason, on_draft_token=None, threads=None):
+    """Brings an existing analysis up to date with the current style and policies.
+
+    The pipeline re-runs, but only stages whose inputs changed do any work.
+    The new draft replaces the refined one, so the feedback of every earlier
+    refinement is then applied to it again in one RefineDraft call. The
+    result becomes the next version in the draft history; the email's status
+    is kept.
+    """
+    fresh = await agent_pipeline_async(email_obj, current_style, on_draft_token, threads)
+    history = analysis.get("history") or DraftHistory(analysis.get("draft", ""))
+    feedback = history.feedback()
+    timings = []
+    if feedback and fresh["draft"]:
+        if on_draft_token: on_draft_token("\n\n*Re-applying your refinements...*\n\n")
+        fresh["draft"], refine_timings = await refine_draft_async(fresh["draft"], feedback[-1], on_draft_token, feedback[:-1])
+        timings.append({"stage": "refine", **refine_timings})
+        reason = f"{reason}; {len(feedback)} refinement(s) re-applied"
+    fresh["version"] = history.commit(fresh["draft"], REDRAFT, reason)
+    fresh["history"] = history
+    fresh["status"], fresh["resolution_msg"] = analysis.get("status", "active"), analysis.get("resolution_msg", "")
+    fresh["stream_timings"] = analysis.get("stream_timings", []) + fresh["stream_timings"] + timings
+    return fresh
+
+async def refine_draft_async(previous_draft, user_feedback, on_token=None, earlier_feedback=()):
+    func = triage_function("RefineDraft")
+    arguments = {"previous_draft": previous_draft, "feedback": user_feedback,
+                 "earlier_feedback": "; ".join(earlier_feedback) or "none"}
+    with tracer.span("refine"):
+        return await stream_invoke(func, arguments, on_token)
+
+def refine_draft_logic(previous_draft, user_feedback, earlier_feedback=()):
+    return run_async(refine_draft_async(previous_draft, user_feedback, earlier_feedback=earlier_feedback))[0]
 
 # --- 6. STATE HELPERS ---
 def mark_done(eid, message):
     st.session_state.analysis_cache[eid]['status'] = 'completed'
     st.session_state.analysis_cache[eid]['resolution_msg'] = message
+    st.session_state.inbox.set_status(eid, st.session_state.analysis_cache[eid])
     st.rerun()
 
 def undo_action(eid):
     st.session_state.analysis_cache[eid]['status'] = 'active'
+    st.session_state.inbox.set_status(eid, st.session_state.analysis_cache[eid])
     st.rerun()
 
+def publish_policy(key, text):
+    """Puts a new version of a KB policy in force now and re-drafts only the open analyses that retrieved its topic."""
+    topic = topic_of(key)
+    now = datetime.now()
+    policy_store.add(PolicyVersion(topic=topic, key=f"{topic} ({now:%Y-%m-%d %H:%M})", text=text, effective=now))
+    cache = st.session_state.analysis_cache
+    affected = [eid for eid, a in cache.items()
+                if a.get('status') != 'completed' and any(topic_of(k) == topic for k in a.get('topics', ()))]
+    async def redraft_all():
+        return await asyncio.gather(*(redraft_async(inbox.get(eid), cache[eid], st.session_state.user_style,
+                                                    f"policy update: {topic}", threads=inbox.threads) for eid in affected))
+    for eid, fresh in zip(affected, run_async(redraft_all())):
+        cache[eid] = intern_analysis(fresh)
+        inbox.set_status(eid, cache[eid])
+    return affected
+
 # --- 7. INITIALIZATION ---
-if "emails" not in st.session_state: st.session_state.emails = generate_mock_emails(15)
+# Columnar store (interned fields, memory-mapped bodies); rows are read through dict-like EmailRecord views
+if "emails" not in st.session_state: st.session_state.emails = InboxStore.from_emails(iter_mock_emails(int(os.getenv("TRIAGEFLOW_INBOX_SIZE", "15"))))
 if "selected_id" not in st.session_state: st.session_state.selected_id = st.session_state.emails[0]['id']
 if "analysis_cache" not in st.session_state: st.session_state.analysis_cache = {}
 if "user_style" not in st.session_state: st.session_state.user_style = knowledge_base['Executive Tone']
 
+# Id index, page slicing and precomputed list icons, so a rerun renders one page rather than the inbox
+if "inbox" not in st.session_state:
+    st.session_state.inbox = InboxView(st.session_state.emails, int(os.getenv("TRIAGEFLOW_PAGE_SIZE", DEFAULT_PAGE_SIZE)))
+inbox = st.session_state.inbox
+if "list_page" not in st.session_state: st.session_state.list_page = inbox.page_of(st.session_state.selected_id)
+
+# Background pre-triage: newest first, the open email and its neighbours jump the queue (a concurrency of 0 turns it off)
+PREFETCH_STATE_ICONS = {PENDING: "⏳", CLASSIFYING: "🔄", FAILED: "⚠️"}
+if "prefetch" not in st.session_state:
+    prefetch_concurrency = int(os.getenv("TRIAGEFLOW_PREFETCH_CONCURRENCY", "3"))
+    st.session_state.prefetch = None
+    if prefetch_concurrency > 0:
+        st.session_state.prefetch = PrefetchScheduler(get_event_loop(), functools.partial(agent_pipeline_async, threads=inbox.threads), concurrency=prefetch_concurrency)
+        st.session_state.prefetch.submit(st.session_state.emails, st.session_state.user_style)
+        # Streamlit has no session-end hook; the InboxView lives exactly as long as the session does
+        weakref.finalize(inbox, st.session_state.prefetch.close)
+prefetch = st.session_state.prefetch
+
+def collect_prefetched():
+    """Moves finished background analyses into the cache (never over one the user already has)."""
+    ready = prefetch.take_ready() if prefetch else {}
+    for eid, res in ready.items():
+        inbox.set_status(eid, st.session_state.analysis_cache.setdefault(eid, intern_analysis(res)))
+    return ready
+
+collect_prefetched()
+if prefetch and inbox.get(st.session_state.selected_id):
+    prefetch.focus(st.session_state.selected_id, inbox.neighbors(st.session_state.selected_id))
+
 # --- 8. UI LAYOUT ---
 st.markdown('<div class="outlook-header">🟦 Outlook &nbsp;&nbsp; 🔍 Search</div>', unsafe_allow_html=True)
 c_folders, c_list, c_read, c_ai = st.columns([1, 2.5, 4.5, 3])
@@ -156,26 +349,50 @@ with c_folders:
     st.button("🗑️ Trash", use_container_width=True)
 
 # 2. List
-with c_list:
-    st.text_input("Search", label_visibility="collapsed")
-    st.write("") 
-    for email in st.session_state.emails:
-        is_done = False
-        if email['id'] in st.session_state.analysis_cache:
-            if st.session_state.analysis_cache[email['id']].get('status') == 'completed':
-                is_done = True
+def turn_page(step):
+    st.session_state.list_page = min(max(0, st.session_state.list_page + step), inbox.page_count - 1)
+
+def reset_page():
+    st.session_state.list_page = 0
+
+def render_email_list():
+    # Pick up background results; refresh the whole page only if the open email just became ready
+    if st.session_state.selected_id in collect_prefetched():
+        st.rerun()
+
+    # Indexed search (prefix words plus class:/status: filters), re-applied so new analyses show up
+    inbox.filter(st.session_state.get("search", ""))
+    if inbox.matches is not None and not len(inbox.matches):
+        st.caption("No emails match this search.")
+
+    # Only the visible page is built; paging reruns just this fragment
+    page = min(st.session_state.list_page, inbox.page_count - 1)
+    if inbox.page_count > 1:
+        c_prev, c_pos, c_next = st.columns([1, 2, 1])
+        c_prev.button("◀", key="page_prev", disabled=page == 0, on_click=turn_page, args=(-1,), use_container_width=True)
+        c_pos.caption(f"Page {page + 1} / {inbox.page_count} · {inbox.visible_count} emails")
+        c_next.button("▶", key="page_next", disabled=page >= inbox.page_count - 1, on_click=turn_page, args=(1,), use_container_width=True)
+
+    for email in inbox.page(page):
+        status_icon = inbox.statuses.get(email['id']) or (PREFETCH_STATE_ICONS.get(prefetch.states.get(email['id']), "") if prefetch else "")
+        status_icon += " "
 
         border = "2px solid #0078D4" if email['id'] == st.session_state.selected_id else "1px solid #eee"
         with st.container(border=True):
-            label = f"**{email['sender']}**\n\n{email['subject']}"
-            if is_done: label = "✅ " + label
+            label = f"{status_icon}**{email['sender']}**\n\n{email['subject']}"
             
             if st.button(label, key=email['id'], use_container_width=True):
                 st.session_state.selected_id = email['id']
                 st.rerun()
 
+with c_list:
+    st.text_input("Search", key="search", placeholder="Search · class:High · status:completed", label_visibility="collapsed", on_change=reset_page)
+    st.write("") 
+    # Re-render just this pane every 2s while background triage is still running
+    st.fragment(run_every=2 if prefetch and prefetch.busy() else None)(render_email_list)()
+
 # 3. Reading Pane
-current = next((e for e in st.session_state.emails if e['id'] == st.session_state.selected_id), None)
+current = inbox.get(st.session_state.selected_id)
 with c_read:
     if current:
         with st.container():
@@ -187,6 +404,39 @@ with c_read:
 # 4. AI SIDEBAR
 with c_ai:
     st.subheader("⚡ TriageFlow Agent")
+    # Changing the style re-drafts the open email; classification and retrieval are reused
+    st.text_input("✍️ Reply style", key="user_style")
+    cache_stats = llm_cache.stats()
+    st.caption(f"LLM cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses · {cache_stats['entries']} entries")
+
+    with st.expander("📈 Performance", expanded=False):
+        stage_stats = tracer.stage_stats()
+        if stage_stats:
+            st.dataframe(
+                [{"stage": stage, **row} for stage, row in stage_stats.items()],
+                hide_index=True, use_container_width=True
+            )
+        else:
+            st.caption("No spans recorded yet.")
+        token_counts = [d['prompt_tokens'] for d in st.session_state.analysis_cache.values() if 'prompt_tokens' in d]
+        if token_counts:
+            full, compact = sum(t['full'] for t in token_counts), sum(t['compact'] for t in token_counts)
+            st.caption(f"Thread de-duplication: {full} → {compact} email tokens over {len(token_counts)} emails "
+                       f"({full / len(token_counts):.0f} → {compact / len(token_counts):.0f} per email)")
+        memo_stats = stage_memo.stats()
+        if memo_stats:
+            st.caption("Stage memo (reused / computed): " + " · ".join(
+                f"{stage} {row['reused']}/{row['computed']}" for stage, row in memo_stats.items()))
+        if st.button("Export trace (OTLP JSON)", key="export_trace", use_container_width=True):
+            st.success(f"Wrote {tracer.export(TRACE_PATH)}")
+
+    with st.expander("📚 Update policy", expanded=False):
+        kb_key = st.selectbox("Policy", list(knowledge_base), key="kb_key")
+        kb_text = st.text_area("New text (in force from now)", key="kb_text", height=80)
+        if st.button("Publish", key="kb_publish", use_container_width=True) and kb_text.strip():
+            with st.spinner("Re-drafting affected emails..."):
+                affected = publish_policy(kb_key, kb_text.strip())
+            st.success(f"{topic_of(kb_key)} updated · re-drafted {len(affected)} of {len(st.session_state.analysis_cache)} analyzed emails")
     
     if current:
         eid = current['id']
@@ -196,9 +446,13 @@ with c_ai:
             if not data:
                 st.info("Agent Standing By")
                 if st.button("🚀 Analyze Email", type="primary", use_container_width=True):
+                    if prefetch: prefetch.discard(eid)
                     with st.spinner("Classifying..."):
-                        res = agent_pipeline(current, st.session_state.user_style)
-                        st.session_state.analysis_cache[eid] = res
+                        # The draft streams in token by token once classification is done
+                        tokens, pending = stream_to_ui(lambda on_token: agent_pipeline_async(current, st.session_state.user_style, on_token, inbox.threads))
+                        st.write_stream(tokens)
+                        st.session_state.analysis_cache[eid] = intern_analysis(pending.result())
+                        inbox.set_status(eid, st.session_state.analysis_cache[eid])
                         st.rerun()
             
             # --- VIEW: COMPLETED ---
@@ -253,6 +507,13 @@ with c_ai:
 
                 # --- SCENARIO 3: HIGH / ACTION ---
                 else:
+                    if data.get('style', st.session_state.user_style) != st.session_state.user_style:
+                        with st.spinner("Re-drafting in the new style..."):
+                            tokens, pending = stream_to_ui(lambda on_token: redraft_async(current, data, st.session_state.user_style, "style changed", on_token, inbox.threads))
+                            st.write_stream(tokens)
+                            st.session_state.analysis_cache[eid] = intern_analysis(pending.result())
+                            st.rerun()
+
                     with st.expander("📚 Knowledge Retrieval", expanded=True):
                         if data['temporal_lock']:
                             st.markdown('<div class="temporal-badge">📅 2025 DATA LOCK</div>', unsafe_allow_html=True)
@@ -278,14 +539,30 @@ with c_ai:
                                 fb = st.text_input("Instructions:", key=f"fb_{eid}")
                                 if st.button("Update Draft", key=f"up_{eid}"):
                                     with st.spinner("Rewriting..."):
-                                        # 1. Generate new text
-                                        new_d = refine_draft_logic(draft_val, fb)
+                                        # Versions are kept as word diffs; hand edits count as a version too
+                                        history = data.get('history') or DraftHistory(data['draft'])
+                                        history.commit(draft_val, EDIT)
+                                        # 1. Generate new text (streamed into the popover as it arrives), with every earlier round of feedback
+                                        tokens, pending = stream_to_ui(lambda on_token: refine_draft_async(draft_val, fb, on_token, history.feedback()))
+                                        st.write_stream(tokens)
+                                        new_d, timings = pending.result()
                                         # 2. Update Cache
                                         st.session_state.analysis_cache[eid]['draft'] = new_d
+                                        st.session_state.analysis_cache[eid]['history'] = history
+                                        st.session_state.analysis_cache[eid].setdefault('stream_timings', []).append({"stage": "refine", **timings})
                                         # 3. Increment Version (This forces the UI to refresh)
-                                        st.session_state.analysis_cache[eid]['version'] = current_version + 1
+                                        st.session_state.analysis_cache[eid]['version'] = max(history.commit(new_d, REFINE, fb), current_version + 1)
                                         st.rerun()
 
+                        history = data.get('history')
+                        if history and history.version:
+                            with st.expander(f"🕘 Versions ({history.version + 1})", expanded=False):
+                                for v in range(history.version, 0, -1):
+                                    source, note = history.log[v - 1]
+                                    removed, added = history.changes(v)
+                                    st.caption(f"v{v} · {source}{': ' + note if note else ''} · −{removed} +{added} words")
+                                    st.code(history.diff(v), language="diff")
+
                     with tab2:
                         if data.get('delegate') and len(data['delegate']) > 10:
                             st.success("Task Identified")
@@ -294,3 +571,6 @@ with c_ai:
                                 mark_done(eid, "Jira Ticket #PROJ-402 created successfully.")
                         else:
                             st.info("No tasks identified.")
+
+# Whole-script cost of this rerun (reruns cut short by st.rerun() are not recorded)
+tracer.record("streamlit.rerun", _rerun_started, time.time_ns())
@@ -0,0 +1,83 @@
+import asyncio
+import re
+
+from tracing import estimate_tokens
+
+# Tokens reserved for the instructions and the per-email answer lines.
+PROMPT_OVERHEAD_TOKENS = 150
+ANSWER_TOKENS_PER_EMAIL = 15
+
+RESULT_LINE = re.compile(r"^\s*\[?#?\s*(?:ID\s*)?([\w-]+)\]?\s*(?:=>|->|:)\s*(Urgency:.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def batch_prompt(rules):
+    """Builds the BatchClassify prompt around the same rules the single-email classifier uses."""
+    return (
+        "Classify EACH email below independently. Emails are delimited by '### EMAIL <id>'.\n"
+        f"{rules}\n"
+        "Return exactly one line per email, in order, and nothing else:\n"
+        "<id> => <classification>\n\n"
+        "{{$emails}}"
+    )
+
+
+def format_email(email, label):
+    """One email of a BatchClassify prompt, labelled with its 1-based position in the batch.
+
+    Caller ids (dotted, Message-IDs, ...) never reach the prompt, so parsing
+    the answer does not depend on what they look like.
+    """
+    return f"### EMAIL {label}\nSubject: {email['subject']}\nBody: {email['body']}\n"
+
+
+def pack_batches(emails, token_budget=3000, max_batch=50):
+    """Greedily groups emails so each batch prompt stays under token_budget.
+
+    Short notifications pack densely and long threads get small batches, so N
+    adapts to the content. Works on any iterable, including a stdin stream.
+    """
+    batch, used = [], PROMPT_OVERHEAD_TOKENS
+    for email in emails:
+        cost = estimate_tokens(format_email(email, len(batch) + 1)) + ANSWER_TOKENS_PER_EMAIL
+        if batch and (used + cost > token_budget or len(batch) >= max_batch):
+            yield batch
+            batch, used = [], PROMPT_OVERHEAD_TOKENS
+        batch.append(email)
+        used += cost
+    if batch:
+        yield batch
+
+
+def parse_batch_result(text, ids):
+    """Maps each id to the classification on the line labelled with its position (1..N); missing ones are left out."""
+    wanted = {str(position): i for position, i in enumerate(ids, 1)}
+    parsed = {}
+    for raw_id, classification in RESULT_LINE.findall(text):
+        if raw_id in wanted and wanted[raw_id] not in parsed:
+            parsed[wanted[raw_id]] = classification
+    return parsed
+
+
+async def classify_batch(batch_func, single_func, emails, invoke):
+    """Classifies one packed batch with a single BatchClassify call.
+
+    Emails whose line is missing or unparseable fall back to individual
+    ClassifyEmail calls. invoke(func, arguments) is usually the caching
+    invoker. Returns ({id: classification}, llm_calls).
+    """
+    calls = 1
+    try:
+        text = str(await invoke(batch_func, {"emails": "\n".join(format_email(e, position) for position, e in enumerate(emails, 1))}))
+        results = parse_batch_result(text, [e["id"] for e in emails])
+    except Exception:
+        results = {}
+
+    missing = [e for e in emails if e["id"] not in results]
+    if missing:
+        singles = await asyncio.gather(*(
+            invoke(single_func, {"subject": e["subject"], "body": e["body"]}) for e in missing
+        ))
+        calls += len(missing)
+        for email, classification in zip(missing, singles):
+            results[email["id"]] = str(classification)
+    return results, calls
@@ -0,0 +1,78 @@
+"""Memory benchmark: list of email dicts vs. the columnar InboxStore.
+
+For each size N the same seeded mock inbox is held both ways. Python heap
+use is measured with tracemalloc (the bodies file is reported separately,
+since it lives in the page cache rather than on the heap). The benchmark
+also times random record reads and checks that both hold the same data.
+
+Run from the repo root:  python benchmarks/bench_inbox_store.py [--sizes 100000 1000000]
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inbox_store import InboxStore
+from mock_data import generate_mock_emails, iter_mock_emails
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    inbox = build()
+    build_s = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return inbox, current, peak, build_s
+
+
+def read_rate(inbox, rows, field):
+    start = time.perf_counter()
+    for row in rows:
+        inbox[row][field]
+    return (time.perf_counter() - start) / len(rows) * 1e6
+
+
+def bench(size, seed, samples):
+    mb = 2 ** 20
+    random.seed(seed)
+    emails, list_bytes, list_peak, list_s = measure(lambda: generate_mock_emails(size))
+    rows = random.Random(seed).sample(range(size), min(samples, size))
+    list_read = {f: read_rate(emails, rows, f) for f in ("subject", "body")}
+    # "received" is relative to generation time, so it is left out of the comparison
+    checksum = [{k: v for k, v in emails[row].items() if k != "received"} for row in rows[:1000]]
+    del emails
+    gc.collect()
+
+    random.seed(seed)
+    store, store_bytes, store_peak, store_s = measure(lambda: InboxStore.from_emails(iter_mock_emails(size)))
+    store_read = {f: read_rate(store, rows, f) for f in ("subject", "body")}
+    assert [{k: v for k, v in store[row].items() if k != "received"} for row in rows[:1000]] == checksum, "store and list disagree"
+    bodies_mb = store._offsets[-1] / mb
+    store.close()
+
+    print(f"N={size:>9,} | list of dicts {list_bytes / mb:8.1f} MB (peak {list_peak / mb:8.1f}) built in {list_s:5.1f} s | "
+          f"InboxStore {store_bytes / mb:7.1f} MB (peak {store_peak / mb:6.1f}) + {bodies_mb:.1f} MB mmap'd bodies, built in {store_s:5.1f} s | "
+          f"{list_bytes / store_bytes:5.1f}x smaller")
+    print(f"{'':13}| read µs/record: subject {list_read['subject']:.2f} → {store_read['subject']:.2f}, "
+          f"body {list_read['body']:.2f} → {store_read['body']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--samples", type=int, default=100_000, help="Random records read per representation")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench(size, args.seed, args.samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Microbenchmark: linear KB substring scan vs. the KnowledgeIndex automaton.
+
+Run from the repo root:  python benchmarks/bench_kb_index.py [--sizes 10000 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kb_index import KnowledgeIndex, topic_of
+from mock_data import generate_mock_emails, knowledge_base
+
+WORDS = ["Alpha", "Budget", "Vendor", "Travel", "Security", "Merger", "Hiring", "Payroll", "Cloud",
+         "Compliance", "Legal", "Audit", "Quarterly", "Regional", "Partner", "Launch", "Support", "Data"]
+
+
+def synthetic_kb(size, rng):
+    kb = dict(knowledge_base)
+    while len(kb) < size:
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.randint(0, 10**6):06d}"
+        if rng.random() < 0.1:
+            name += f" ({rng.choice([2020, 2025])})"
+        kb[name] = f"POLICY: synthetic entry {len(kb)}."
+    return kb
+
+
+def linear_lookup(kb, text):
+    return [k for k in kb if topic_of(k) in text]
+
+
+def bench(size, emails, rng):
+    kb = synthetic_kb(size, rng)
+    keys = list(kb)
+    # Make some emails actually mention KB topics
+    bodies = [e["body"] + (f" See {topic_of(rng.choice(keys))}." if rng.random() < 0.5 else "") for e in emails]
+
+    start = time.perf_counter()
+    index = KnowledgeIndex(kb)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [linear_lookup(kb, b) for b in bodies]
+    linear_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = [index.lookup(b) for b in bodies]
+    index_s = time.perf_counter() - start
+
+    assert got == expected, "index and linear scan disagree"
+    per = len(bodies)
+    print(f"KB={size:>7,} | build {build_s:6.2f} s | linear {linear_s / per * 1e3:8.3f} ms/email | "
+          f"index {index_s / per * 1e3:7.4f} ms/email | speedup {linear_s / index_s:7.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--emails", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    emails = generate_mock_emails(args.emails)
+    for size in args.sizes:
+        bench(size, emails, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Check the resilient LLM client layer against a local fake Azure endpoint.
+
+Starts benchmarks/fake_azure_endpoint.py (request quota with 429s, a few
+500/503s, a slow tail) and sends the same ClassifyEmail calls twice
+through AzureChatCompletion, once at a steady load below the quota (where
+the slow tail dominates) and once as a burst well over it:
+
+- sdk default:  the stock openai client (its own 2 retries, no rate limiting, no hedging)
+- llm_client:   pool_connections + ResilientLLM, as triage_kernel wires it
+
+It reports success rate, latency percentiles, server-side request and
+connection counts and the client's retry/hedge counters, checks hedging on a
+request the endpoint makes slow on purpose, then streams a few DraftReply
+calls through ResilientLLM.stream. Assertions at the end make it
+usable as a smoke test: every llm_client call must succeed.
+
+Run from the repo root:  python benchmarks/bench_llm_client.py [--requests 400 --concurrency 32]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_azure_endpoint
+from llm_client import AdaptiveTokenBucket, ResilientLLM, pool_connections
+from mock_data import generate_mock_emails
+from tracing import percentile
+from triage_kernel import PLUGIN_NAME, PROMPTS
+
+API_VERSION = "2024-10-21"
+
+
+def percentiles(values):
+    values = sorted(values)
+    return {f"p{pct}": round(percentile(values, pct)) for pct in (50, 95, 99)}
+
+
+def build_kernel(async_client):
+    # The client is passed in directly: AzureChatCompletion's own settings only accept https endpoints
+    import semantic_kernel as sk
+    from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+
+    kernel = sk.Kernel()
+    kernel.add_service(AzureChatCompletion(service_id="default", deployment_name="gpt-4o", async_client=async_client))
+    for name, template in PROMPTS.items():
+        kernel.add_function(prompt=template, function_name=name, plugin_name=PLUGIN_NAME)
+    return kernel
+
+
+async def burst(kernel, emails, concurrency, client=None):
+    from semantic_kernel.functions import KernelArguments
+
+    function = kernel.plugins[PLUGIN_NAME]["ClassifyEmail"]
+    gate = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(email):
+        nonlocal failures
+        arguments = KernelArguments(subject=email["subject"], body=email["body"])
+        request = lambda: kernel.invoke(function, arguments)
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await (client.call("ClassifyEmail", request) if client else request())
+            except Exception:
+                failures += 1
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(e) for e in emails))
+    return latencies, failures, time.perf_counter() - start
+
+
+async def streams(kernel, client, emails, style):
+    from semantic_kernel.functions import KernelArguments
+
+    function = kernel.plugins[PLUGIN_NAME]["DraftReply"]
+
+    async def one(email):
+        arguments = KernelArguments(body=email["body"], context="", style=style)
+        parts = []
+        async for update in client.stream("DraftReply", lambda: kernel.invoke_stream(function, arguments)):
+            parts.append(str(update[0]))
+        return "".join(parts)
+
+    return await asyncio.gather(*(one(e) for e in emails))
+
+
+def report(name, latencies, failures, elapsed, server, extra=""):
+    total = len(latencies) + failures
+    pct = percentiles(latencies)
+    print(f"{name:12} | ok {len(latencies):4}/{total} ({len(latencies) / total:6.1%}) | {elapsed:5.1f} s | "
+          f"p50 {pct['p50']:5} ms  p95 {pct['p95']:5} ms  p99 {pct['p99']:5} ms | "
+          f"server: {server.stats['requests']:4} requests, {server.stats['429']:3} x 429, "
+          f"{server.stats['5xx']:2} x 5xx, {server.stats['connections']:3} connections{extra}")
+
+
+async def compare(args, emails, concurrency):
+    """Runs the burst through the stock client and through llm_client, each against a fresh fake endpoint."""
+    from openai import AsyncAzureOpenAI
+
+    settings = dict(quota=args.quota, latency_ms=args.latency_ms, slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+                    error_rate=args.error_rate, seed=args.seed)
+    server = fake_azure_endpoint.start(**settings)
+    sdk_default = AsyncAzureOpenAI(azure_endpoint=server.endpoint, api_key="fake-key", api_version=API_VERSION)
+    latencies, failures, elapsed = await burst(build_kernel(sdk_default), emails, concurrency)
+    report("sdk default", latencies, failures, elapsed, server)
+    server.shutdown()
+
+    server = fake_azure_endpoint.start(**settings)
+    client = ResilientLLM(AdaptiveTokenBucket(rate=args.rps, burst=args.rps))
+    sdk_client = AsyncAzureOpenAI(azure_endpoint=server.endpoint, api_key="fake-key", api_version=API_VERSION)
+    kernel = build_kernel(pool_connections(sdk_client, client.limiter))
+    latencies, failures, elapsed = await burst(kernel, emails, concurrency, client)
+    stats = client.stats
+    report("llm_client", latencies, failures, elapsed, server,
+           f" | client: {stats['retries']} retries, {stats['hedged']} hedges ({stats['hedge_wins']} won), "
+           f"rate now {client.limiter.rate:.1f}/s")
+    assert failures == 0, f"{failures} calls failed through llm_client"
+    return server, kernel, client
+
+
+async def check_hedging(args, emails):
+    """One request made slow on purpose, after enough fast ones for a p95: it must be hedged, and the hedge must win."""
+    from openai import AsyncAzureOpenAI
+
+    server = fake_azure_endpoint.start(quota=10_000, latency_ms=args.latency_ms, slow_rate=0, slow_ms=args.slow_ms,
+                                       error_rate=0, seed=args.seed)
+    client = ResilientLLM(AdaptiveTokenBucket(rate=0))
+    sdk_client = AsyncAzureOpenAI(azure_endpoint=server.endpoint, api_key="fake-key", api_version=API_VERSION)
+    kernel = build_kernel(pool_connections(sdk_client, client.limiter))
+    warmup = emails[:client.latency.min_samples]
+    await burst(kernel, warmup, 1, client)
+    server.slow_next = 1
+    latencies, failures, _ = await burst(kernel, emails[:1], 1, client)
+    server.shutdown()
+    print(f"{'hedging':12} | 1 forced-slow request after {len(warmup)} warm-up calls: {latencies[0]:.0f} ms "
+          f"(slow path {args.slow_ms:.0f} ms), {client.stats['hedged']} hedged, {client.stats['hedge_wins']} won")
+    assert not failures and client.stats["hedged"] == 1 and client.stats["hedge_wins"] == 1, \
+        "a request slower than the rolling p95 should have been hedged, and the hedge should have won"
+
+
+async def run(args, emails):
+    print(f"steady load: {args.steady_concurrency} in flight, {len(emails[:args.steady_requests])} requests")
+    server, _, client = await compare(args, emails[:args.steady_requests], args.steady_concurrency)
+    server.shutdown()
+    await check_hedging(args, emails)
+
+    print(f"\nburst over the quota: {args.concurrency} in flight, {len(emails)} requests")
+    server, kernel, client = await compare(args, emails, args.concurrency)
+    assert client.stats["throttled"] and client.stats["retries"], "the fake endpoint should have throttled at least once"
+    drafts = await streams(kernel, client, emails[:args.streams], "Formal, concise")
+    assert all(d.startswith("Thanks for flagging") for d in drafts), "a streamed draft came back incomplete"
+    print(f"{'':12} | {len(drafts)} DraftReply streams complete; client totals {dict(client.stats)}")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32, help="In flight during the burst")
+    parser.add_argument("--steady-requests", type=int, default=300)
+    parser.add_argument("--steady-concurrency", type=int, default=1)
+    parser.add_argument("--quota", type=int, default=60, help="Fake endpoint: requests per second before 429")
+    parser.add_argument("--rps", type=float, default=80.0, help="llm_client starting rate (deliberately above the quota)")
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--slow-rate", type=float, default=0.04)
+    parser.add_argument("--slow-ms", type=float, default=1500.0)
+    parser.add_argument("--error-rate", type=float, default=0.03)
+    parser.add_argument("--streams", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    logging.getLogger("semantic_kernel").setLevel(logging.CRITICAL)  # every injected 5xx is logged otherwise
+    emails = generate_mock_emails(args.requests)
+    asyncio.run(run(args, emails))
+
+
+if __name__ == "__main__":
+    main()
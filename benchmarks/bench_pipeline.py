@@ -0,0 +1,169 @@
+"""Offline throughput benchmark for agent_pipeline (app.py) and the main.py batch path.
+
+Both entry points run against MockChatCompletion, so no Azure calls are made.
+Each size N runs over generate_mock_emails(N) with a seeded RNG. The report
+covers emails/sec, per-stage latency percentiles, LLM call counts and peak
+Python memory (tracemalloc). It is printed and written as JSON so runs can
+be diffed.
+
+Run from the repo root:
+    python benchmarks/bench_pipeline.py --sizes 100 1000 10000 --output bench_results.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tracing import percentile
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    return {f"p{pct}": round(percentile(values, pct), 2) for pct in (50, 95, 99)}
+
+
+def configure_environment(args, workdir):
+    """Must run before app/main are imported: both read the cache and index settings at import time."""
+    os.environ.update({
+        "TRIAGEFLOW_MOCK_LLM": "1",
+        "TRIAGEFLOW_MOCK_LATENCY_MS": str(args.latency_ms),
+        "TRIAGEFLOW_MOCK_LATENCY_SIGMA": str(args.latency_sigma),
+        "TRIAGEFLOW_MOCK_TOKENS_PER_SEC": str(args.tokens_per_sec),
+        "TRIAGEFLOW_MOCK_ERROR_RATE": str(args.error_rate),
+        "TRIAGEFLOW_MOCK_SEED": str(args.seed),
+        "TRIAGEFLOW_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+        "TRIAGEFLOW_CACHE_TTL": "604800" if args.cache else "0",
+        "TRIAGEFLOW_INDEX_DIR": os.path.join(workdir, "index"),
+        "TRIAGEFLOW_PREFETCH_CONCURRENCY": "0",  # no background triage when app.py is imported
+        "TRIAGEFLOW_LLM_RPS": "0",  # the mock has no quota; injected 429s are still retried
+    })
+
+
+def import_app():
+    """Imports app.py in Streamlit bare mode (UI calls become no-ops) to reach agent_pipeline_async."""
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    streamlit.logger.set_log_level("error")  # loggers created during the import start at the default level
+    return app
+
+
+def get_kernel():
+    """The shared kernel app and main invoke through (built lazily, so import it after configure_environment)."""
+    from triage_kernel import get_kernel
+    return get_kernel()
+
+
+def bench_agent_pipeline(app, emails, concurrency):
+    service = get_kernel().get_service("default")
+    service.reset_stats()
+    stages, errors = {}, 0
+
+    async def run_all():
+        nonlocal errors
+        gate = asyncio.Semaphore(concurrency)
+        async def one(email):
+            nonlocal errors
+            async with gate:
+                try:
+                    result = await app.agent_pipeline_async(email, app.knowledge_base["Executive Tone"])
+                except Exception:
+                    errors += 1
+                    return
+            for stage, ms in result["latency_ms"].items():
+                stages.setdefault(stage, []).append(ms)
+        await asyncio.gather(*(one(e) for e in emails))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    app.run_async(run_all())
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "emails_per_sec": round(len(emails) / elapsed, 2),
+        "elapsed_s": round(elapsed, 3),
+        "stage_latency_ms": {stage: percentiles(values) for stage, values in stages.items()},
+        "llm_calls": service.stats()["calls"],
+        "llm_calls_total": service.stats()["total_calls"],
+        "errors": errors,
+        "peak_mem_mb": round(peak / 2**20, 2),
+    }
+
+
+def bench_main_batch(main, emails, concurrency):
+    service = get_kernel().get_service("default")
+    service.reset_stats()
+    sink = io.StringIO()
+    tracemalloc.start()
+    with contextlib.redirect_stderr(io.StringIO()):
+        stats = asyncio.run(main.batch_main(iter(emails), sink, io.StringIO(), concurrency))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "emails_per_sec": round(stats["emails_per_sec"], 2),
+        "elapsed_s": round(stats["elapsed_s"], 3),
+        "stage_latency_ms": {"email": {"p50": stats["p50_ms"], "p95": stats["p95_ms"]}},
+        "llm_calls": service.stats()["calls"],
+        "llm_calls_total": service.stats()["total_calls"],
+        "pre_classified": stats["pre_classified"],
+        "errors": stats["errors"],
+        "peak_mem_mb": round(peak / 2**20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--concurrency", type=int, default=32, help="Emails (app) / batches (main) in flight")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of the latency")
+    parser.add_argument("--tokens-per-sec", type=float, default=2000.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true", help="Keep the persistent LLM cache on (off by default so every call hits the mock)")
+    parser.add_argument("--skip", choices=["app", "main"], action="append", default=[])
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(args, workdir)
+        app = None if "app" in args.skip else import_app()
+        with contextlib.redirect_stderr(io.StringIO()):
+            import main as cli
+        report = {"python": platform.python_version(), "config": vars(args), "runs": []}
+
+        for size in args.sizes:
+            random.seed(args.seed)
+            emails = cli.generate_mock_emails(size)
+            for key, name, bench, module in (("app", "agent_pipeline", bench_agent_pipeline, app),
+                                             ("main", "main.batch_main", bench_main_batch, cli)):
+                if key in args.skip:
+                    continue
+                result = {"entry": name, "n": size, **bench(module, emails, args.concurrency)}
+                report["runs"].append(result)
+                print(f"{name:16} N={size:>6,} | {result['emails_per_sec']:9.1f} emails/s | "
+                      f"LLM calls {result['llm_calls_total']:>6,} | peak {result['peak_mem_mb']:7.1f} MB | "
+                      f"{json.dumps(result['stage_latency_ms'])}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
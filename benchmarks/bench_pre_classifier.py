@@ -0,0 +1,44 @@
+"""Local pre-classifier: escalation rate, accuracy lost and cost per email across thresholds.
+
+Run from the repo root:  python benchmarks/bench_pre_classifier.py [--train 2000 --test 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_data import generate_mock_emails
+from pre_classifier import PreClassifier, evaluate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--train", type=int, default=2000)
+    parser.add_argument("--test", type=int, default=5000)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.7, 0.9, 0.99])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    train, test = generate_mock_emails(args.train), generate_mock_emails(args.test)
+
+    start = time.perf_counter()
+    model = PreClassifier.train(train)
+    print(f"Trained on {len(train):,} emails in {time.perf_counter() - start:.2f} s")
+
+    start = time.perf_counter()
+    for email in test:
+        model.predict(email)
+    print(f"Prediction: {(time.perf_counter() - start) / len(test) * 1e6:.1f} µs/email")
+
+    for threshold in args.thresholds:
+        report = evaluate(model, test, threshold)
+        print(f"threshold {threshold:.2f} | escalated to LLM {report['escalation_rate']:6.1%} | "
+              f"accuracy lost {report['accuracy_lost']:6.2%}")
+
+
+if __name__ == "__main__":
+    main()
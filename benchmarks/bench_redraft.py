@@ -0,0 +1,123 @@
+"""Incremental re-drafting: LLM calls after a style change or a policy update, with and without the stage memo.
+
+Runs app.agent_pipeline_async over N mock emails against MockChatCompletion
+(LLM cache off, so every miss reaches the mock), then:
+
+- style change:  every analyzed email is brought up to date with a new reply style
+- policy update: a new version of the most-retrieved policy is published and only
+                 the emails whose retrieved topics include it are re-run
+
+Each is measured with the stage memo (only stages whose inputs changed run)
+and without it (a memo that keeps nothing: the whole pipeline re-runs). It
+also compares draft history kept as word diffs against full copies over a
+few refinement rounds.
+
+Run from the repo root:  python benchmarks/bench_redraft.py [--emails 300]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import get_kernel, import_app
+
+
+def configure_environment(workdir):
+    os.environ.update({
+        "TRIAGEFLOW_MOCK_LLM": "1",
+        "TRIAGEFLOW_MOCK_LATENCY_MS": "5",
+        "TRIAGEFLOW_MOCK_TOKENS_PER_SEC": "5000",
+        "TRIAGEFLOW_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+        "TRIAGEFLOW_CACHE_TTL": "0",
+        "TRIAGEFLOW_INDEX_DIR": os.path.join(workdir, "index"),
+        "TRIAGEFLOW_PREFETCH_CONCURRENCY": "0",
+        "TRIAGEFLOW_LLM_RPS": "0",
+    })
+
+
+def run_pipelines(app, emails, style):
+    async def run_all():
+        return await asyncio.gather(*(app.agent_pipeline_async(e, style) for e in emails))
+    service = get_kernel().get_service("default")
+    service.reset_stats()
+    start = time.perf_counter()
+    results = app.run_async(run_all())
+    return results, Counter(service.stats()["calls"]), time.perf_counter() - start
+
+
+def scenario(app, memo, emails, style, new_style):
+    app.stage_memo = memo
+    analyses, _, _ = run_pipelines(app, emails, style)
+    _, style_calls, style_s = run_pipelines(app, emails, new_style)
+
+    counts = Counter(topic for a in analyses for topic in {app.topic_of(k) for k in a["topics"]})
+    topic = counts.most_common(1)[0][0]
+    affected = [e for e, a in zip(emails, analyses) if any(app.topic_of(k) == topic for k in a["topics"])]
+    app.policy_store.add(app.PolicyVersion(topic=topic, key=f"{topic} (bench {id(memo)})",
+                                           text=f"POLICY: revised {topic} guidance ({id(memo)}).", effective=datetime.now()))
+    # With the memo, only the dependents are re-run; without it the whole inbox is, as before
+    _, kb_calls, kb_s = run_pipelines(app, affected if memo.max_entries else emails, new_style)
+    return style_calls, style_s, kb_calls, kb_s, topic, len(affected)
+
+
+def calls(counter):
+    return f"{sum(counter.values()):5} LLM calls ({', '.join(f'{k} {v}' for k, v in sorted(counter.items())) or 'none'})"
+
+
+def history_sizes(rounds):
+    from draft_history import DraftHistory, REFINE
+    base = ("Thanks for flagging this. I have reviewed the details against current policy and we can proceed "
+            "as outlined; I will confirm next steps by end of day. Best, [Your Name]")
+    rng = random.Random(0)
+    history, copies = DraftHistory(base), [base]
+    text = base
+    for i in range(rounds):
+        words = text.split(" ")
+        words[rng.randrange(len(words))] = rng.choice(["Friday", "shortly", "today", "team", "approved"])
+        if i % 3 == 0:
+            words.insert(rng.randrange(len(words)), "please")
+        text = " ".join(words)
+        if history.commit(text, REFINE, f"round {i + 1}") == len(copies):
+            copies.append(text)
+    assert all(history.text_at(v) == copies[v] for v in range(len(copies)))
+    return sum(len(c) for c in copies), history.stored_chars()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=300)
+    parser.add_argument("--refinements", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir)
+        app = import_app()
+        from mock_data import generate_mock_emails
+        from stage_memo import StageMemo
+        random.seed(args.seed)
+        emails = generate_mock_emails(args.emails)
+        style = app.knowledge_base["Executive Tone"]
+
+        for name, memo in (("full re-run", StageMemo(max_entries=0)), ("stage memo", StageMemo())):
+            style_calls, style_s, kb_calls, kb_s, topic, affected = scenario(app, memo, emails, style, "Warm, two sentences.")
+            print(f"{name:12} | style change:  {calls(style_calls)} in {style_s:5.2f} s")
+            print(f"{'':12} | policy update ({topic}, {affected}/{len(emails)} emails depend on it): "
+                  f"{calls(kb_calls)} in {kb_s:5.2f} s")
+
+    full, diffs = history_sizes(args.refinements)
+    print(f"draft history | {args.refinements} refinements: full copies {full:,} chars, word diffs {diffs:,} chars "
+          f"({full / diffs:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Microbenchmark: per-keystroke linear inbox filter vs. the SearchIndex inverted index.
+
+Half the inbox is given a triage result (class from the mock classifier,
+some marked completed) so the class:/status: filters have something to do.
+The mock templates share a tiny vocabulary, so a second pass rewrites the
+bodies with varied, mostly unique words (like real mail: names, numbers,
+typos) to show index build time grows linearly with the vocabulary too.
+
+Run from the repo root:  python benchmarks/bench_search_index.py [--sizes 10000 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_data import generate_mock_emails
+from mock_llm import classify_text
+from search_index import SearchIndex, FILTER, TOKEN, UNANALYZED
+
+QUERIES = ["travel", "trav", "budget q", "user4", "class:High", "class:spam status:pending",
+           "status:completed merger", "press merg class:action", "zzz"]
+
+
+def linear_search(emails, analyses, query):
+    words, filters = [], []
+    for part in query.split():
+        match = FILTER.match(part)
+        if match:
+            filters.append((match.group(1).lower(), match.group(2).lower()))
+        else:
+            words.extend(TOKEN.findall(part.lower()))
+    hits = []
+    for position, email in enumerate(emails):
+        tokens = TOKEN.findall(f"{email['sender']} {email['subject']} {email['body']}".lower())
+        if not all(any(t.startswith(w) for t in tokens) for w in words):
+            continue
+        analysis = analyses.get(email["id"])
+        facets = {"class": analysis["class"].lower() if analysis else "",
+                  "status": analysis["status"] if analysis else UNANALYZED}
+        if all(any(t.startswith(v) for t in TOKEN.findall(facets[name])) for name, v in filters):
+            hits.append(position)
+    return hits
+
+
+def varied_emails(size, rng):
+    """Mock emails whose bodies are 30 words from a vocabulary that keeps growing with the inbox."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    emails = generate_mock_emails(size)
+    for email in emails:
+        words = ["".join(rng.choices(letters, k=rng.randint(4, 9))) if rng.random() < 0.2
+                 else f"w{int(rng.paretovariate(1.1))}" for _ in range(30)]
+        email["body"] = email["body"] + " " + " ".join(words)
+    return emails
+
+
+def bench(size, rng, varied=False):
+    emails = varied_emails(size, rng) if varied else generate_mock_emails(size)
+    analyses = {}
+    for email in emails:
+        if rng.random() < 0.5:
+            analyses[email["id"]] = {"class": classify_text(email["subject"] + " " + email["body"]),
+                                     "status": "completed" if rng.random() < 0.3 else "active"}
+
+    start = time.perf_counter()
+    index = SearchIndex()
+    for email in emails:
+        index.add(email)
+    for eid, analysis in analyses.items():
+        index.update(eid, analysis)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.search("trav")  # the first prefix query merges the newly seen terms into the sorted vocabulary
+    merge_ms = (time.perf_counter() - start) * 1e3
+
+    print(f"\nInbox={size:,}{' (varied text)' if varied else ''} | {len(index._vocabulary):,} terms | "
+          f"index build {build_s:.2f} s ({build_s / size * 1e6:.1f} µs/email) | first query {merge_ms:.0f} ms")
+    for query in QUERIES:
+        start = time.perf_counter()
+        expected = linear_search(emails, analyses, query)
+        linear_ms = (time.perf_counter() - start) * 1e3
+
+        runs = 20
+        start = time.perf_counter()
+        for _ in range(runs):
+            got = index.search(query)
+        index_ms = (time.perf_counter() - start) * 1e3 / runs
+
+        assert got.tolist() == expected, f"index and linear scan disagree on {query!r}"
+        print(f"  {query!r:30} {len(expected):>7,} hits | linear {linear_ms:9.1f} ms | "
+              f"index {index_ms:7.2f} ms | speedup {linear_ms / index_ms:6.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        bench(size, rng)
+    for size in args.sizes:
+        bench(size, rng, varied=True)
+
+
+if __name__ == "__main__":
+    main()
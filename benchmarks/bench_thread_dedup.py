@@ -0,0 +1,90 @@
+"""Prompt tokens per email with and without ThreadIndex de-duplication.
+
+Counts the email text that agent_pipeline (app.py) puts into its LLM calls:
+the body goes to ClassifyEmail, DraftReply (unless Spam) and ExtractTask
+(High/Action), and the thread summary goes to DraftReply only. The mock
+classifier decides which calls happen. Two inboxes are measured:
+
+- mock:   generate_mock_emails, whose replies quote one line of context
+- chains: synthetic reply chains where every reply quotes the whole
+          conversation so far, as mail clients do
+
+Run from the repo root:  python benchmarks/bench_thread_dedup.py [--emails 1000] [--chains 50 --depth 8]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_data import generate_mock_emails, templates
+from mock_llm import classify_text
+from thread_model import ThreadIndex
+from tracing import estimate_tokens
+
+
+def reply_chains(count, depth, rng):
+    emails = []
+    for chain in range(count):
+        subject, body = rng.choice(templates["Actionable"])
+        previous = None
+        for i in range(rng.randint(1, depth)):
+            sender = f"user{rng.randint(1, 50)}@example.com"
+            fresh = body if i == 0 else rng.choice(templates[rng.choice(["Actionable", "Important"])])[1]
+            if previous:
+                quoted = "\n".join("> " + line for line in previous["body"].splitlines())
+                fresh = f"{fresh}\n\nOn {previous['sender']} wrote:\n{quoted}"
+            previous = {"id": f"{chain}-{i}", "sender": sender, "subject": ("Re: " if i else "") + subject,
+                        "body": fresh, "received": "09:00", "thread_id": f"chain-{chain}"}
+            emails.append(previous)
+    return emails
+
+
+def calls_for(email):
+    """Which pipeline calls carry the body: (calls with the body, whether DraftReply runs)."""
+    cls = classify_text(email["subject"] + " " + email["body"])
+    drafts = "Spam" not in cls
+    return 1 + drafts + ("High" in cls or "Action" in cls), drafts
+
+
+def measure(name, emails, show):
+    threads = ThreadIndex()
+    for email in emails:
+        threads.add(email)
+    full_total = compact_total = 0
+    rows = []
+    for email in emails:
+        compact = threads.compact(email)
+        calls, drafts = calls_for(email)
+        full = estimate_tokens(email["body"]) * calls
+        after = estimate_tokens(compact["body"]) * calls + estimate_tokens(compact["thread"]) * drafts
+        full_total += full
+        compact_total += after
+        rows.append((email["id"], email["subject"], full, after))
+
+    print(f"\n{name}: {len(emails):,} emails in {len(threads.conversations):,} conversations | "
+          f"summary cache {threads.summary_hits} hits / {threads.summary_misses} misses")
+    for eid, subject, full, after in rows[:show]:
+        print(f"  {str(eid):>8}  {subject[:36]:36} {full:>6} → {after:>5} tokens")
+    print(f"  total {full_total:,} → {compact_total:,} tokens "
+          f"({full_total / len(emails):.1f} → {compact_total / len(emails):.1f} per email, "
+          f"{1 - compact_total / full_total:.1%} saved)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=1000, help="Size of the generate_mock_emails inbox")
+    parser.add_argument("--chains", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=8, help="Max messages per synthetic reply chain")
+    parser.add_argument("--show", type=int, default=8, help="Per-email rows to print per inbox")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    measure("mock", generate_mock_emails(args.emails), args.show)
+    measure("chains", reply_chains(args.chains, args.depth, random.Random(args.seed)), args.show)
+
+
+if __name__ == "__main__":
+    main()
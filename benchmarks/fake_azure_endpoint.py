@@ -0,0 +1,172 @@
+"""Local stand-in for an Azure OpenAI chat-completions deployment, misbehaving on purpose.
+
+Speaks enough of the REST protocol for AzureChatCompletion (plain JSON and
+SSE streams) and answers with mock_llm.respond(). On top of that it:
+
+- enforces a request quota per window, answering 429 with retry-after-ms
+  and sending x-ratelimit-remaining/reset-requests on every response;
+- fails a fraction of requests with 500/503;
+- adds a slow tail: a fraction of requests take `slow_ms` instead of `latency_ms`
+  (set `slow_next` to make the next n answered requests slow, for deterministic checks).
+
+Used by bench_llm_client.py; can also be run on its own and pointed at with
+AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8765 for manual runs of app.py/main.py:
+
+    python benchmarks/fake_azure_endpoint.py --port 8765
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_llm import respond
+
+
+class FakeAzure(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, quota=40, window_s=1.0, latency_ms=30.0, slow_rate=0.05, slow_ms=800.0,
+                 error_rate=0.02, seed=0):
+        super().__init__(address, Handler)
+        self.quota, self.window_s = quota, window_s
+        self.latency_ms, self.slow_rate, self.slow_ms = latency_ms, slow_rate, slow_ms
+        self.error_rate = error_rate
+        self.slow_next = 0
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._window_start, self._used = time.monotonic(), 0
+
+    def handle_error(self, request, client_address):
+        pass  # clients hang up on cancelled (hedged) requests; that is expected here
+
+    @property
+    def endpoint(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def admit(self):
+        """(status, headers, delay_s) for the next request."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window_s:
+                self._window_start, self._used = now, 0
+            reset_s = self.window_s - (now - self._window_start)
+            self.stats["requests"] += 1
+            if self._used >= self.quota:
+                self.stats["429"] += 1
+                return 429, {"retry-after-ms": str(int(reset_s * 1000) + 1), **self._quota_headers(0, reset_s)}, 0.0
+            self._used += 1
+            headers = self._quota_headers(self.quota - self._used, reset_s)
+            if self.rng.random() < self.error_rate:
+                self.stats["5xx"] += 1
+                return self.rng.choice((500, 503)), headers, 0.0
+            slow = self.rng.random() < self.slow_rate
+            if self.slow_next:
+                self.slow_next -= 1
+                slow = True
+            self.stats["slow" if slow else "ok"] += 1
+            return 200, headers, (self.slow_ms if slow else self.latency_ms * self.rng.uniform(0.5, 1.5)) / 1000
+
+    @staticmethod
+    def _quota_headers(remaining, reset_s):
+        return {"x-ratelimit-remaining-requests": str(remaining), "x-ratelimit-reset-requests": f"{reset_s:.3f}s"}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if "/chat/completions" not in self.path:
+            return self._json(404, {"error": {"code": "404", "message": "Resource not found"}})
+        status, headers, delay_s = self.server.admit()
+        if status != 200:
+            message = "Rate limit exceeded" if status == 429 else "Server error"
+            return self._json(status, {"error": {"code": str(status), "message": message}}, headers)
+        time.sleep(delay_s)
+        messages = request.get("messages") or [{"content": ""}]
+        _, text = respond(messages[-1].get("content") or "")
+        if request.get("stream"):
+            return self._stream(text, request, headers)
+        self._json(200, {
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model") or "gpt-4o",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": len(text.split()), "total_tokens": 1 + len(text.split())},
+        }, headers)
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, text, request, headers):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            delta = {"role": "assistant", "content": word} if i == 0 else {"content": " " + word}
+            self._chunk({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": request.get("model") or "gpt-4o",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if i == len(words) - 1 else None}]})
+        self._chunk(None)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, payload):
+        data = b"data: " + (json.dumps(payload).encode() if payload is not None else b"[DONE]") + b"\n\n"
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start(port=0, **settings):
+    """Starts a FakeAzure on a daemon thread; returns the server (call .shutdown() when done)."""
+    server = FakeAzure(("127.0.0.1", port), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--quota", type=int, default=40, help="Requests allowed per window")
+    parser.add_argument("--window-s", type=float, default=1.0)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=800.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+    server = FakeAzure(("127.0.0.1", args.port), quota=args.quota, window_s=args.window_s, latency_ms=args.latency_ms,
+                       slow_rate=args.slow_rate, slow_ms=args.slow_ms, error_rate=args.error_rate)
+    print(f"Fake Azure OpenAI endpoint on {server.endpoint} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(dict(server.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Cold-start profile: how long main.py and app.py take before they can do useful work.
+
+Each scenario runs in a fresh interpreter (best and median of --runs, after
+one warm-up run that builds the on-disk indexes) with the offline mock LLM:
+
+- cli --help:       python main.py --help
+- import main:      CLI ready to triage (cache, pre-classifier, indexes)
+- import main + kernel: the above plus building the Semantic Kernel, i.e. the cost the first LLM call pays
+- import app:       the Streamlit script body in bare mode, up to the first rendered page
+
+Then it lists the slowest imports behind `import main` (python -X importtime).
+To compare against another revision, check it out and point --repo at it:
+
+    git worktree add ../triageflow-before HEAD~1
+    python benchmarks/profile_startup.py --repo ../triageflow-before
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Older checkouts build the kernel at import time and have no triage_kernel module
+BUILD_KERNEL = "try:\n from triage_kernel import get_kernel\n get_kernel()\nexcept ImportError:\n pass\n"
+IMPORT_APP = (
+    "import contextlib, io, streamlit.logger\n"
+    "streamlit.logger.set_log_level('error')\n"
+    "with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):\n"
+    " import app\n"
+)
+SCENARIOS = [
+    ("cli --help", ["main.py", "--help"]),
+    ("import main", ["-c", "import main"]),
+    ("import main + kernel", ["-c", "import main\n" + BUILD_KERNEL]),
+    ("import app", ["-c", IMPORT_APP]),
+]
+
+
+def run(repo, args):
+    env = dict(os.environ, TRIAGEFLOW_MOCK_LLM="1", TRIAGEFLOW_PREFETCH_CONCURRENCY="0", PYTHONPATH=repo)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], cwd=repo, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def slowest_imports(repo, top):
+    """(cumulative_us, module) for the modules main.py imports directly."""
+    env = dict(os.environ, TRIAGEFLOW_MOCK_LLM="1", PYTHONPATH=repo)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=repo, env=env,
+                          capture_output=True, text=True, check=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        # -X importtime indents two spaces per nesting level; main itself is at one
+        if len(parts[2]) - len(parts[2].lstrip()) == 3:
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repo", default=ROOT, help="Checkout to profile (default: this one)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports to list")
+    args = parser.parse_args()
+    repo = os.path.abspath(args.repo)
+
+    print(f"Startup profile of {repo}")
+    for name, command in SCENARIOS:
+        run(repo, command)
+        times = [run(repo, command) for _ in range(args.runs)]
+        print(f"  {name:22} best {min(times):6.2f} s | median {statistics.median(times):6.2f} s")
+
+    print("\nSlowest imports behind `import main` (cumulative):")
+    for cumulative, module in slowest_imports(repo, args.top):
+        print(f"  {cumulative / 1e6:6.2f} s  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import difflib
+import re
+
+TOKEN = re.compile(r"\s+|[^\s]+")
+REFINE, EDIT, REDRAFT = "refined", "edited", "re-drafted"
+
+
+def tokenize(text):
+    """Words and the whitespace between them, so joining the tokens gives the text back exactly."""
+    return TOKEN.findall(text or "")
+
+
+def make_delta(new, old):
+    """Edits that turn tokens `new` back into `old`: (start, end, replacement) over new, unchanged runs left out."""
+    matcher = difflib.SequenceMatcher(None, new, old, autojunk=False)
+    return tuple((i1, i2, "".join(old[j1:j2])) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal")
+
+
+def apply_delta(tokens, delta):
+    out, cursor = [], 0
+    for start, end, replacement in delta:
+        out.extend(tokens[cursor:start])
+        out.append(replacement)
+        cursor = end
+    out.extend(tokens[cursor:])
+    return tokenize("".join(out))
+
+
+class DraftHistory:
+    """Every version of one email's draft: the latest in full, earlier ones as reverse word diffs.
+
+    Version 0 is the pipeline's draft; each later version records where it
+    came from (REFINE with the feedback, EDIT by hand, REDRAFT after a style
+    or policy change). Going back n versions applies n deltas.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._deltas = []
+        self.log = []
+
+    @property
+    def version(self):
+        return len(self._deltas)
+
+    def commit(self, text, source, note=""):
+        """Records text as the next version; returns the version number (unchanged text is not a new version)."""
+        if text == self.text:
+            return self.version
+        self._deltas.append(make_delta(tokenize(text), tokenize(self.text)))
+        self.log.append((source, note))
+        self.text = text
+        return self.version
+
+    def feedback(self):
+        """Feedback of every refinement so far, oldest first."""
+        return [note for source, note in self.log if source == REFINE]
+
+    def text_at(self, version):
+        tokens = tokenize(self.text)
+        for delta in reversed(self._deltas[version:]):
+            tokens = apply_delta(tokens, delta)
+        return "".join(tokens)
+
+    def changes(self, version):
+        """(removed, added) word counts between version - 1 and version."""
+        delta = self._deltas[version - 1]
+        newer = tokenize(self.text_at(version))
+        removed = sum(len(r.split()) for *_, r in delta)
+        added = sum(sum(1 for t in newer[s:e] if t.strip()) for s, e, _ in delta)
+        return removed, added
+
+    def diff(self, version):
+        """Unified word-per-line diff from version - 1 to version, for display."""
+        before = [t for t in tokenize(self.text_at(version - 1)) if t.strip()]
+        after = [t for t in tokenize(self.text_at(version)) if t.strip()]
+        return "\n".join(line for line in difflib.unified_diff(before, after, f"v{version - 1}", f"v{version}", lineterm="", n=2))
+
+    def stored_chars(self):
+        """Characters held (latest text + deltas), against len(self.text) * (version + 1) for full copies."""
+        return len(self.text) + sum(len(r) + 16 for delta in self._deltas for *_, r in delta)
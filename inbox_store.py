@@ -0,0 +1,166 @@
+import bisect
+import mmap
+import sys
+import tempfile
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+
+INTERNED_FIELDS = ("category_ground_truth", "sender", "subject", "received")
+FIELDS = ("id", *INTERNED_FIELDS, "body")
+
+
+class InternTable:
+    """Each distinct string stored once; rows hold its integer code."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class EmailRecord(Mapping):
+    """Read-only dict-like view of one inbox row; fields are fetched from the store on access."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, field):
+        return self._store.value(self._row, field)
+
+    def __iter__(self):
+        return iter(self._store.fields_of(self._row))
+
+    def __len__(self):
+        return len(self._store.fields_of(self._row))
+
+    def __repr__(self):
+        return f"EmailRecord({self['id']!r}, {self['subject']!r})"
+
+
+class InboxStore(Sequence):
+    """Columnar inbox: typed arrays for fixed fields, intern tables for repeated strings.
+
+    ids are an array('q'); sender, subject, received and category are
+    array('I') codes into InternTables, so 1M mock emails hold only a few
+    hundred distinct strings. Bodies are appended to a file (a temporary one
+    unless body_path is given) and read lazily through an mmap using an
+    offsets array. Rows are exposed as EmailRecord views, which behave like
+    the email dicts the rest of the app uses. Emails must have integer ids;
+    lookups by id are a binary search while ids arrive in increasing order
+    (the mock generator's), and a dict otherwise.
+    """
+
+    def __init__(self, body_path=None):
+        self._ids = array("q")
+        self._columns = {field: (array("I"), InternTable()) for field in INTERNED_FIELDS}
+        self._offsets = array("Q", [0])
+        self._bodies = open(body_path, "w+b") if body_path else tempfile.TemporaryFile()
+        self._map = None
+        self._map_lock = threading.Lock()
+        self._extra = {}
+        self._rows_by_id = None
+
+    @classmethod
+    def from_emails(cls, emails, body_path=None):
+        store = cls(body_path)
+        store.extend(emails)
+        return store
+
+    def append(self, email):
+        eid = email["id"]
+        if self._rows_by_id is None and self._ids and eid <= self._ids[-1]:
+            self._rows_by_id = {e: row for row, e in enumerate(self._ids)}
+        if self._rows_by_id is not None:
+            self._rows_by_id[eid] = len(self._ids)
+        self._ids.append(eid)
+        for field, (codes, table) in self._columns.items():
+            codes.append(table.code(email.get(field, "")))
+        body = email.get("body", "").encode("utf-8")
+        self._bodies.seek(0, 2)
+        self._bodies.write(body)
+        self._offsets.append(self._offsets[-1] + len(body))
+        extra = {k: v for k, v in email.items() if k not in FIELDS}
+        if extra:
+            self._extra[len(self._ids) - 1] = extra
+
+    def extend(self, emails):
+        for email in emails:
+            self.append(email)
+        self._bodies.flush()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [EmailRecord(self, row) for row in range(*index.indices(len(self._ids)))]
+        if index < 0:
+            index += len(self._ids)
+        if not 0 <= index < len(self._ids):
+            raise IndexError("inbox row out of range")
+        return EmailRecord(self, index)
+
+    def position(self, eid):
+        """Row of the email with id `eid`, or None."""
+        if self._rows_by_id is not None:
+            return self._rows_by_id.get(eid)
+        row = bisect.bisect_left(self._ids, eid)
+        return row if row < len(self._ids) and self._ids[row] == eid else None
+
+    def get(self, eid):
+        row = self.position(eid)
+        return None if row is None else EmailRecord(self, row)
+
+    def value(self, row, field):
+        if field == "id":
+            return self._ids[row]
+        if field == "body":
+            return self._body(row)
+        column = self._columns.get(field)
+        if column is not None:
+            codes, table = column
+            return table.values[codes[row]]
+        extra = self._extra.get(row)
+        if extra is None or field not in extra:
+            raise KeyError(field)
+        return extra[field]
+
+    def fields_of(self, row):
+        return FIELDS + tuple(self._extra.get(row, ()))
+
+    def _body(self, row):
+        start, end = self._offsets[row], self._offsets[row + 1]
+        if start == end:
+            return ""
+        with self._map_lock:
+            if self._map is None or len(self._map) < end:
+                # Bodies appended since the last mapping: flush and map the file again
+                self._bodies.flush()
+                self._map = mmap.mmap(self._bodies.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map[start:end].decode("utf-8")
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._bodies.close()
+
+
+def intern_analysis(analysis):
+    """Shares the strings that repeat across analyses (class, retrieved context) instead of copying them per email."""
+    for field in ("class", "context"):
+        if isinstance(analysis.get(field), str):
+            analysis[field] = sys.intern(analysis[field])
+    return analysis
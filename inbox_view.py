@@ -0,0 +1,84 @@
+import math
+
+from inbox_store import InboxStore
+from search_index import SearchIndex
+from thread_model import ThreadIndex
+
+DEFAULT_PAGE_SIZE = 25
+
+
+class InboxView:
+    """Paged, indexed view over the inbox so a Streamlit rerun touches one page.
+
+    Emails live in an InboxStore (a plain list is converted), which keeps
+    inbox order and resolves ids to rows for selection and neighbour lookups
+    without a per-email dict. `statuses` holds each email's precomputed list
+    icon and is updated at the points where an analysis changes, instead of
+    being re-derived for the whole inbox on every rerun. A search narrows the
+    pages to the matching positions (see search_index.SearchIndex); `threads`
+    groups the inbox into conversations for prompt compaction.
+    """
+
+    def __init__(self, emails, page_size=DEFAULT_PAGE_SIZE):
+        self.emails = emails if isinstance(emails, InboxStore) else InboxStore.from_emails(emails)
+        self.page_size = max(1, page_size)
+        self.statuses = {}
+        self.search = SearchIndex()
+        self.threads = ThreadIndex()
+        for email in self.emails:
+            self.search.add(email)
+            self.threads.add(email)
+        self.matches = None
+
+    def __len__(self):
+        return len(self.emails)
+
+    def add(self, email):
+        """Appends a newly arrived email to the inbox and its indexes."""
+        self.emails.append(email)
+        self.search.add(email)
+        self.threads.add(email)
+
+    def filter(self, query):
+        """Restricts paging to emails matching `query`; an empty query shows the whole inbox."""
+        self.matches = self.search.search(query or "")
+
+    @property
+    def visible_count(self):
+        return len(self.emails) if self.matches is None else len(self.matches)
+
+    def get(self, eid):
+        return self.emails.get(eid)
+
+    @property
+    def page_count(self):
+        return max(1, math.ceil(self.visible_count / self.page_size))
+
+    def page(self, number):
+        """Emails on page `number` (clamped to the valid range)."""
+        number = min(max(0, number), self.page_count - 1)
+        start = number * self.page_size
+        if self.matches is None:
+            return self.emails[start:start + self.page_size]
+        return [self.emails[i] for i in self.matches[start:start + self.page_size]]
+
+    def page_of(self, eid):
+        position = self.emails.position(eid) or 0
+        if self.matches is not None:
+            position = int(self.matches.searchsorted(position))
+        return position // self.page_size
+
+    def neighbors(self, eid, radius=2):
+        """Ids of up to `radius` emails either side of `eid` in inbox order."""
+        pos = self.emails.position(eid)
+        if pos is None:
+            return []
+        return [e["id"] for e in self.emails[max(0, pos - radius):pos] + self.emails[pos + 1:pos + 1 + radius]]
+
+    def set_status(self, eid, analysis):
+        """Recomputes the list icon for one email from its analysis (or its absence)."""
+        if not analysis:
+            self.statuses.pop(eid, None)
+        else:
+            self.statuses[eid] = "✅" if analysis.get("status") == "completed" else "⚡"
+        self.search.update(eid, analysis)
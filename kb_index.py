@@ -0,0 +1,70 @@
+from collections import deque
+
+
+def topic_of(key):
+    """Match phrase for a KB key: 'Travel Policy (2020)' is looked up as 'Travel Policy'."""
+    return key.split("(")[0].strip()
+
+
+class KnowledgeIndex:
+    """Aho–Corasick automaton over knowledge-base topics.
+
+    Built once per knowledge base; lookup() finds every topic that occurs in a
+    text in a single pass, independent of how many entries the KB holds.
+    Matches are plain substring matches, same as `topic in body`.
+    """
+
+    def __init__(self, knowledge_base, pattern_of=topic_of):
+        self.keys = list(knowledge_base)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for position, key in enumerate(self.keys):
+            pattern = pattern_of(key)
+            if pattern:
+                self._add(pattern, position)
+        self._link()
+
+    def _add(self, pattern, position):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (position,)
+
+    def _link(self):
+        # Breadth-first so every failure target is finished before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._out[self._fail[nxt]]:
+                    self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def lookup(self, text):
+        """Returns the KB keys whose topic occurs in text, in knowledge-base order."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return [self.keys[p] for p in sorted(found)]
+
+    def __len__(self):
+        return len(self.keys)
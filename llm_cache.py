@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from tracing import tracer, usage_of, estimate_tokens, INPUT_TOKENS, OUTPUT_TOKENS, MODEL, CACHE_HIT
+
+DEFAULT_CACHE_PATH = os.getenv("TRIAGEFLOW_CACHE_PATH", ".triageflow_cache.sqlite3")
+DEFAULT_TTL_SECONDS = float(os.getenv("TRIAGEFLOW_CACHE_TTL", 7 * 24 * 3600))
+
+
+def normalize(value):
+    """Collapses whitespace so trivially different copies of templated mail share a key."""
+    return " ".join(str(value).split())
+
+
+def prompt_template_of(func):
+    if isinstance(getattr(func, "template", None), str):
+        return func.template
+    config = getattr(getattr(func, "prompt_template", None), "prompt_template_config", None)
+    return getattr(config, "template", "") or ""
+
+
+class LLMCache:
+    """Disk-backed (SQLite) cache of LLM results with TTL and LRU eviction.
+
+    Keys are content hashes of function name, prompt template, normalized
+    arguments and deployment, so results survive browser sessions and
+    restarts and are shared by every entry point that points at the same file.
+
+    A hit is a single indexed SELECT: its access time is kept in memory and
+    written with the next set() (or every ACCESS_FLUSH hits). Eviction runs
+    only once the tracked row count passes max_entries, and then trims to
+    EVICT_TO of it so the next writes do not evict again.
+    """
+
+    ACCESS_FLUSH = 256
+    EVICT_TO = 0.9
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created)")
+        self._db.commit()
+        self._entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(function_name, template, arguments, deployment_name):
+        payload = json.dumps({
+            "function": function_name,
+            "template": template,
+            "arguments": {k: normalize(v) for k, v in sorted(dict(arguments).items())},
+            "deployment": deployment_name,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def key_for(self, func, arguments, deployment_name):
+        return self.make_key(func.name, prompt_template_of(func), arguments, deployment_name)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                # An expired row is left for set() to replace or the next eviction to purge
+                self.misses += 1
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= self.ACCESS_FLUSH:
+                self._flush_accessed()
+                self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._flush_accessed()
+            updated = self._db.execute(
+                "UPDATE llm_cache SET value = ?, created = ?, accessed = ? WHERE key = ?", (value, now, now, key)
+            ).rowcount
+            if not updated:
+                self._db.execute(
+                    "INSERT INTO llm_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)", (key, value, now, now)
+                )
+                self._entries += 1
+            if self._entries > self.max_entries:
+                self._evict(now)
+            self._db.commit()
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self._db.executemany("UPDATE llm_cache SET accessed = ? WHERE key = ?",
+                                 [(at, key) for key, at in self._accessed.items()])
+            self._accessed.clear()
+
+    def _evict(self, now):
+        """Drops expired rows, then the least recently read ones down to EVICT_TO * max_entries."""
+        self._db.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl_seconds,))
+        self._db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (int(self.max_entries * self.EVICT_TO),)
+        )
+        # Other processes may share the file, so recount rather than trust the tally
+        self._entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0, "entries": entries}
+
+
+def cached_invoker(cache, deployment_name):
+    """Returns an async invoke(func, arguments) -> str that consults the cache before the LLM.
+
+    func is a triage_kernel.TriageFunction (anything with name, template and
+    an async invoke(arguments)); a hit never touches the kernel. Every call is
+    traced as an llm.<FunctionName> span with token counts and cache hits.
+    """
+    async def invoke(func, arguments):
+        with tracer.span(f"llm.{func.name}", **{MODEL: deployment_name}) as span:
+            key, value = _lookup(cache, func, arguments, deployment_name, span)
+            if value is None:
+                result = await func.invoke(arguments)
+                value = str(result)
+                prompt_tokens, completion_tokens = usage_of(result)
+                span.set(**{
+                    INPUT_TOKENS: prompt_tokens if prompt_tokens is not None else estimate_tokens(getattr(result, "rendered_prompt", None) or ""),
+                    OUTPUT_TOKENS: completion_tokens if completion_tokens is not None else estimate_tokens(value),
+                })
+                await _store(cache, key, value)
+            return value
+    return invoke
+
+
+def cached_streamer(cache, deployment_name):
+    """Streaming counterpart of cached_invoker: async stream(func, arguments, on_token=None) -> (text, timings).
+
+    on_token is called with each chunk as it arrives; a cache hit is
+    delivered as a single chunk. timings holds time-to-first-token and total
+    time in ms, and whether the answer came from the cache. Streaming
+    responses carry no usage block, so span token counts are estimated.
+    """
+    async def stream(func, arguments, on_token=None):
+        with tracer.span(f"llm.{func.name}", **{MODEL: deployment_name, "streaming": True}) as span:
+            start = time.perf_counter()
+            key, text = _lookup(cache, func, arguments, deployment_name, span)
+            if text is not None:
+                if on_token: on_token(text)
+                elapsed = round((time.perf_counter() - start) * 1000, 1)
+                return text, {"ttft_ms": elapsed, "total_ms": elapsed, "cached": True}
+
+            chunks, ttft = [], None
+            async for update in func.invoke_stream(arguments):
+                piece = "".join(str(c) for c in update) if isinstance(update, list) else ""
+                if not piece: continue
+                if ttft is None: ttft = (time.perf_counter() - start) * 1000
+                chunks.append(piece)
+                if on_token: on_token(piece)
+            text = "".join(chunks)
+            await _store(cache, key, text)
+            total = (time.perf_counter() - start) * 1000
+            ttft = round(ttft if ttft is not None else total, 1)
+            span.set(**{
+                INPUT_TOKENS: estimate_tokens(prompt_template_of(func) + "".join(str(v) for v in arguments.values())),
+                OUTPUT_TOKENS: estimate_tokens(text),
+                "ttft_ms": ttft
+            })
+            return text, {"ttft_ms": ttft, "total_ms": round(total, 1), "cached": False}
+    return stream
+
+
+def _lookup(cache, func, arguments, deployment_name, span):
+    key = cache.key_for(func, arguments, deployment_name)
+    value = cache.get(key)
+    span.set(**{CACHE_HIT: value is not None})
+    return key, value
+
+
+async def _store(cache, key, value):
+    # The write commits to disk, so it runs off the event loop
+    await asyncio.to_thread(cache.set, key, value)
@@ -0,0 +1,384 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from tracing import percentile
+
+DEFAULT_MAX_CONNECTIONS = int(os.getenv("TRIAGEFLOW_LLM_MAX_CONNECTIONS", "20"))
+DEFAULT_TIMEOUT_S = float(os.getenv("TRIAGEFLOW_LLM_TIMEOUT", "60"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+
+def parse_duration(value):
+    """Seconds from a rate-limit header value: '2', '20ms', '1.5s' or '6m0s'. None if unparseable."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def retry_after(headers):
+    """Server-requested wait in seconds (retry-after-ms, retry-after), or None."""
+    if not headers:
+        return None
+    if headers.get("retry-after-ms") is not None:
+        ms = parse_duration(headers.get("retry-after-ms"))
+        return ms / 1000 if ms is not None else None
+    return parse_duration(headers.get("retry-after"))
+
+
+def http_failure(exc):
+    """(status_code, headers) of the HTTP error behind an exception, looking through SDK wrappers."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        status = getattr(exc, "status_code", None)
+        if isinstance(status, int):
+            response = getattr(exc, "response", None)
+            return status, getattr(response, "headers", None) or getattr(exc, "headers", None)
+        exc = exc.__cause__ or exc.__context__
+    return None, None
+
+
+def transport_errors():
+    """Exception types for a request that never got an HTTP answer (refused, reset, timed out)."""
+    errors = [asyncio.TimeoutError, ConnectionError]
+    try:
+        import httpx
+        errors.append(httpx.TransportError)
+    except ImportError:
+        pass
+    try:
+        import openai
+        errors += [openai.APIConnectionError, openai.APITimeoutError]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def is_retryable(exc):
+    """HTTP failures with a retryable status, and transport failures anywhere in the cause chain.
+
+    SDK wrappers (e.g. Semantic Kernel's KernelInvokeException) are looked
+    through, as in http_failure.
+    """
+    status, _ = http_failure(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    errors = transport_errors()
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, errors):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class AdaptiveTokenBucket:
+    """Request-rate limiter that follows what the endpoint reports.
+
+    Starts at `rate` requests/s with `burst` capacity. Each success raises
+    the rate additively (up to max_rate); a 429 halves it (at most once per
+    decrease_interval, however many in-flight requests see it) and blocks
+    every caller until the server's retry-after has passed. The x-ratelimit-
+    remaining-requests / x-ratelimit-reset-requests headers are tracked as
+    the quota left in the current window (counted down locally as requests
+    go out), so the client waits for the reset instead of collecting 429s.
+    A rate of 0 turns the bucket off except for those blocks.
+    Thread-safe and loop-agnostic: waiting is a plain asyncio.sleep.
+    """
+
+    def __init__(self, rate=50.0, burst=50, min_rate=0.2, max_rate=100.0, increase=0.5, decrease_interval=1.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_interval = decrease_interval
+        self._last_decrease = 0.0
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+        self.quota_left, self.quota_reset_at = None, 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.rate <= 0:
+            self.tokens = float(self.burst)
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.quota_reset_at:
+                    self.quota_left = None
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.quota_left == 0:
+                    wait = self.quota_reset_at - now
+                elif self.tokens >= 1:
+                    self._take()
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def _take(self):
+        self.tokens -= 1
+        if self.quota_left is not None:
+            self.quota_left -= 1
+
+    def try_acquire(self):
+        """Takes a token only if one is free right now (used for optional hedge requests)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until and self.quota_left != 0 and self.tokens >= 1:
+                self._take()
+                return True
+            return False
+
+    def on_success(self):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def observe(self, headers):
+        """Applies the quota a successful response reports."""
+        with self._lock:
+            self._apply_headers(headers)
+
+    def on_throttled(self, headers=None):
+        with self._lock:
+            wait = retry_after(headers)
+            # Requests already in flight get the same 429; cut the rate at most once per interval
+            now = time.monotonic()
+            if self.rate > 0 and now - self._last_decrease >= self.decrease_interval:
+                self._last_decrease = now
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = min(self.tokens, 0.0)
+                wait = wait if wait is not None else 1 / self.rate
+            self.blocked_until = max(self.blocked_until, now + (wait or 0.0))
+            self._apply_headers(headers)
+
+    def _apply_headers(self, headers):
+        if not headers:
+            return
+        try:
+            remaining = int(headers.get("x-ratelimit-remaining-requests"))
+        except (TypeError, ValueError):
+            return
+        reset_at = time.monotonic() + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 1.0)
+        if self.quota_left is None or reset_at > self.quota_reset_at + 0.5:
+            # A new quota window: the server's count is all we know
+            self.quota_left, self.quota_reset_at = remaining, reset_at
+        else:
+            # Same window: responses arrive out of order and lag requests already sent
+            self.quota_left = min(self.quota_left, remaining)
+
+
+class LatencyTracker:
+    """Rolling per-function latencies of successful calls, for the hedging deadline."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, name):
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, 95)
+
+
+class ResilientLLM:
+    """Shared call layer under the TriagePlugin functions.
+
+    Every request waits for the adaptive token bucket, is retried on
+    429/5xx/timeouts with full-jitter exponential backoff (or the server's
+    retry-after), and is hedged: if it has not answered by the function's
+    rolling p95 latency, one backup request is sent (only when the bucket
+    has a spare token) and whichever finishes first wins. Streams are hedged
+    and retried on time-to-first-chunk only, since tokens already shown in
+    the UI cannot be taken back.
+    """
+
+    def __init__(self, limiter=None, max_retries=4, base_delay=0.5, max_delay=20.0, hedge=True):
+        self.limiter = limiter or AdaptiveTokenBucket()
+        self.latency = LatencyTracker()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge = hedge
+        self.stats = Counter()
+
+    @classmethod
+    def from_env(cls):
+        """Reads TRIAGEFLOW_LLM_RPS (0 = no limit), _BURST, _MAX_RETRIES and _HEDGE (0 disables hedging)."""
+        limiter = AdaptiveTokenBucket(rate=float(os.getenv("TRIAGEFLOW_LLM_RPS", "50")),
+                                      burst=int(os.getenv("TRIAGEFLOW_LLM_BURST", "50")))
+        return cls(limiter, max_retries=int(os.getenv("TRIAGEFLOW_LLM_MAX_RETRIES", "4")),
+                   hedge=os.getenv("TRIAGEFLOW_LLM_HEDGE", "1") != "0")
+
+    async def call(self, name, make_request):
+        """Awaits make_request() (a fresh coroutine per attempt) with limiting, retries and hedging."""
+        return await self._with_retries(name, make_request)
+
+    async def stream(self, name, make_stream):
+        """Yields from make_stream() (a fresh async iterator per attempt); see the class docstring."""
+        async def first_chunk():
+            # The SDK's stream (and its tracing context) must live in a single task, so a pump task
+            # drains it into a queue and this attempt finishes as soon as the first chunk is there
+            queue = asyncio.Queue()
+            pump = asyncio.ensure_future(_pump(make_stream, queue))
+            try:
+                first = await queue.get()
+            except asyncio.CancelledError:
+                pump.cancel()
+                raise
+            if isinstance(first, _StreamFailed):
+                raise first.error
+            return first, pump, queue
+
+        first, pump, queue = await self._with_retries(name, first_chunk, cleanup=_stop_pump)
+        try:
+            while first is not _END:
+                yield first
+                first = await queue.get()
+                if isinstance(first, _StreamFailed):
+                    raise first.error
+        finally:
+            pump.cancel()
+
+    async def _with_retries(self, name, make_request, cleanup=None):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            self.stats["requests"] += 1
+            try:
+                return await self._hedged(name, make_request, cleanup)
+            except Exception as exc:
+                status, headers = http_failure(exc)
+                if status == 429:
+                    self.stats["throttled"] += 1
+                    self.limiter.on_throttled(headers)
+                if attempt == self.max_retries or not is_retryable(exc):
+                    self.stats["failed"] += 1
+                    raise
+                self.stats["retries"] += 1
+                wait = retry_after(headers)
+                if wait is None:
+                    wait = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                await asyncio.sleep(wait)
+
+    async def _hedged(self, name, make_request, cleanup):
+        started = time.monotonic()
+        primary = asyncio.ensure_future(make_request())
+        deadline = self.latency.p95(name) if self.hedge else None
+        tasks = [primary]
+        try:
+            if deadline is not None:
+                done, _ = await asyncio.wait(tasks, timeout=deadline)
+                if not done and self.limiter.try_acquire():
+                    self.stats["hedged"] += 1
+                    tasks.append(asyncio.ensure_future(make_request()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if not t.cancelled() and t.exception() is None), None)
+                if winner is not None:
+                    if winner is not primary:
+                        self.stats["hedge_wins"] += 1
+                    self.latency.record(name, time.monotonic() - started)
+                    self.limiter.on_success()
+                    for task in tasks:
+                        if task is not winner:
+                            await _discard(task, cleanup)
+                    return winner.result()
+            raise primary.exception() if not primary.cancelled() else tasks[-1].exception()
+        except asyncio.CancelledError:
+            for task in tasks:
+                await _discard(task, cleanup)
+            raise
+
+
+async def _discard(task, cleanup):
+    if not task.done():
+        task.cancel()
+        try:
+            await task
+        except BaseException:
+            pass
+    elif cleanup and not task.cancelled() and task.exception() is None:
+        await cleanup(task.result())
+
+
+_END = object()
+
+
+class _StreamFailed:
+    def __init__(self, error):
+        self.error = error
+
+
+async def _pump(make_stream, queue):
+    try:
+        async for chunk in make_stream():
+            await queue.put(chunk)
+        await queue.put(_END)
+    except Exception as exc:
+        await queue.put(_StreamFailed(exc))
+
+
+async def _stop_pump(result):
+    result[1].cancel()
+
+
+def observe_rate_limits(limiter):
+    """httpx response hook that feeds rate-limit headers from successful responses to the limiter."""
+    async def hook(response):
+        if response.status_code < 400:
+            limiter.observe(response.headers)
+    return hook
+
+
+def pool_connections(client, limiter, max_connections=DEFAULT_MAX_CONNECTIONS, timeout=DEFAULT_TIMEOUT_S):
+    """Copy of an openai client (credentials kept) on one keep-alive httpx pool; retries are left to ResilientLLM."""
+    import httpx
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(timeout, connect=10.0),
+        event_hooks={"response": [observe_rate_limits(limiter)]},
+    )
+    return client.with_options(http_client=http_client, max_retries=0)
+
+
+# Process-wide layer shared by app.py and main.py (one limiter per endpoint quota)
+llm_client = ResilientLLM.from_env()
@@ -1,100 +1,97 @@
-print("DEBUG: The script is starting...")
+import sys
+print("DEBUG: The script is starting...", file=sys.stderr)
 
+import argparse
 import asyncio
-import os
+import contextlib
+import json
+import time
 from dotenv import load_dotenv
-import semantic_kernel as sk
-from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
-# FIX: Import KernelArguments directly
-from semantic_kernel.functions import KernelArguments
-from mock_data import incoming_emails, knowledge_base
+from mock_data import incoming_emails, knowledge_base, generate_mock_emails, policy_versions
+from batch_classify import pack_batches, classify_batch
+from llm_cache import LLMCache, cached_invoker
+from kb_index import KnowledgeIndex
+from semantic_index import SemanticIndex
+from policy_store import PolicyStore
+from pre_classifier import PreClassifier, LOCAL_CLASSES, DEFAULT_THRESHOLD
+from triage_kernel import triage_function, get_deployment_name
+from tracing import tracer, estimate_tokens, percentile
+from thread_model import ThreadIndex
 
 # --- SETUP ---
 load_dotenv()
-kernel = sk.Kernel()
-
-# Configure Azure AI Service
-deployment_name = "gpt-4o" 
-endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-api_key = os.getenv("AZURE_OPENAI_KEY")
-
-# Add Azure Service to Kernel
-kernel.add_service(
-    AzureChatCompletion(
-        service_id="default",
-        deployment_name=deployment_name,
-        endpoint=endpoint,
-        api_key=api_key
-    )
-)
+
+# The Semantic Kernel (Azure connector, or the offline mock when TRIAGEFLOW_MOCK_LLM is set) is
+# built on the first LLM call that misses the cache; prompts are shared with app.py in triage_kernel.py
+deployment_name = get_deployment_name()
+
+# Persistent LLM result cache (same file as the Streamlit app by default)
+llm_cache = LLMCache()
+invoke_llm = cached_invoker(llm_cache, deployment_name)
 
 # --- AGENT 1: CLASSIFICATION ---
-classify_prompt = """
-Analyze the following email.
-Subject: {{$subject}}
-Body: {{$body}}
-
-Return ONLY a concise classification string in this format: 
-"Urgency: [High/Medium/Low] | Intent: [Task/Question/FYI]"
-"""
-classify_func = kernel.add_function(
-    prompt=classify_prompt,
-    function_name="ClassifyEmail",
-    plugin_name="TriagePlugin"
-)
+# Local first stage: confident Spam/FYI never reaches the LLM
+pre_classifier = PreClassifier.load_or_train()
+
+classify_func = triage_function("ClassifyEmail")
+# Same rules, many emails per call (used by batch mode)
+batch_classify_func = triage_function("BatchClassify")
 
 # --- AGENT 2: RESEARCH (RAG) ---
-def research_logic(email_body):
-    print("   🔍 [Research Agent]: Scanning Knowledge Base...")
-    context_found = []
-    for topic, info in knowledge_base.items():
-        if topic in email_body:
-            context_found.append(f"FACT: {info}")
-    
-    context_found.append(f"STYLE: {knowledge_base['Executive Tone']}")
+# The index finds every topic in one pass; dated keys like "Travel Policy (2025)" match on "Travel Policy"
+kb_index = KnowledgeIndex(knowledge_base)
+
+semantic_index = SemanticIndex.load_or_build(knowledge_base)
+# Only the version of each topic that is active today is used as a FACT
+policy_store = PolicyStore.from_knowledge_base(knowledge_base, policy_versions)
+
+def research_logic(email_body, related_topics=None):
+    """related_topics: semantic matches already computed for this email (batch mode scores them together)."""
+    print("   🔍 [Research Agent]: Scanning Knowledge Base...", file=sys.stderr)
+    with tracer.span("retrieve"):
+        if related_topics is None:
+            related_topics = [topic for topic, _ in semantic_index.search(email_body)]
+        context_found = []
+        topics = kb_index.lookup(email_body)
+        topics += [topic for topic in related_topics if topic not in topics]
+        for policy in policy_store.resolve(topics):
+            context_found.append(f"FACT: {policy.text}")
     return "\n".join(context_found)
 
 # --- AGENT 3: DRAFTER ---
-draft_prompt = """
-You are an executive assistant.
-Incoming Email: {{$body}}
-
-Use this Context to answer: 
-{{$context}}
-
-Draft a reply. Follow the STYLE guide strictly.
-Draft:
-"""
-draft_func = kernel.add_function(
-    prompt=draft_prompt,
-    function_name="DraftReply",
-    plugin_name="TriagePlugin"
-)
+draft_func = triage_function("DraftReply")
+draft_style = knowledge_base['Executive Tone']
 
 # --- MAIN EXECUTION ---
 async def main():
     print("\n--- 🚀 STARTING TRIAGEFLOW (GPT-4o) ---\n")
+    threads = ThreadIndex()
+    for email in incoming_emails:
+        threads.add(email)
 
     for email in incoming_emails:
         print(f"📩 NEW EMAIL: {email['subject']}")
+        # Quoted history already in the inbox is replaced by a short thread summary
+        email = threads.compact(email)
         
         # 1. CLASSIFY
-        # FIX: Use KernelArguments() instead of sk.KernelArguments()
-        classification = await kernel.invoke(
+        classification = pre_classifier.triage(email) or await invoke_llm(
             classify_func, 
-            KernelArguments(subject=email["subject"], body=email["body"])
+            {"subject": email["subject"], "body": email["body"]}
         )
         print(f"   🤖 [Classification]: {classification}")
 
-        if "High" in str(classification) or "Question" in str(classification):
+        if "High" in str(classification) or "Action" in str(classification):
             # 2. RESEARCH
             context_data = research_logic(email["body"])
+            if email["thread"]:
+                context_data += f"\nTHREAD: {email['thread']}"
             print(f"   📚 [Context Found]: {context_data}")
 
             # 3. DRAFT
-            draft = await kernel.invoke(
+            draft = await invoke_llm(
                 draft_func,
-                KernelArguments(body=email["body"], context=context_data)
+                {"body": email["body"], "context": context_data, "style": draft_style}
             )
             
             # 4. APPROVAL GATE
@@ -108,5 +105,251 @@ async def main():
         else:
             print("   💤 Low priority. Archived.\n")
 
+# --- BATCH MODE (HEADLESS) ---
+def read_emails(path):
+    """Yields email dicts from a JSONL file, or from stdin when path is '-'.
+
+    A line that is not valid JSON yields {"error": ...} naming the line, so
+    one bad line is reported in the output instead of ending the run.
+    """
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield {"error": f"line {number}: invalid JSON ({exc.msg})"}
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def invalid_record(email):
+    """Why an input record cannot be triaged, or None when it can."""
+    if not isinstance(email, dict):
+        return "record is not a JSON object"
+    if "error" in email and "body" not in email:
+        return email["error"]
+    missing = [field for field in ("subject", "body") if not isinstance(email.get(field), str)]
+    if missing:
+        return f"missing or non-text field(s): {', '.join(missing)}"
+    return None
+
+async def finish_triage(email, classification, start, related_topics=None, draft_slots=None):
+    """Drafts a reply when the classification needs one. Never blocks on a human.
+
+    draft_slots (an asyncio.Semaphore shared by every batch) bounds the
+    DraftReply calls in flight; without it a batch drafts all at once.
+    """
+    result = {"id": email["id"], "subject": email["subject"], "classification": classification, "draft": "", "needs_review": False}
+
+    if "High" in classification or "Action" in classification:
+        context_data = research_logic(email["body"], related_topics)
+        if email.get("thread"):
+            context_data += f"\nTHREAD: {email['thread']}"
+        async with draft_slots or contextlib.nullcontext():
+            with tracer.span("draft", email_id=email["id"]):
+                draft = await invoke_llm(
+                    draft_func,
+                    {"body": email["body"], "context": context_data, "style": draft_style}
+                )
+        result["draft"] = draft
+        result["needs_review"] = True
+
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+async def triage_batch(emails, pre_threshold=DEFAULT_THRESHOLD, draft_slots=None):
+    """Classifies a packed batch in one BatchClassify call, then drafts concurrently.
+
+    Emails the local pre-classifier is confident about (Spam/FYI at or above
+    pre_threshold; None disables it) skip the LLM entirely. Drafts wait for
+    one of draft_slots (see finish_triage). Returns the per-email results.
+    """
+    with tracer.span("batch", emails=len(emails)):
+        return await _triage_batch(emails, pre_threshold, draft_slots)
+
+async def _triage_batch(emails, pre_threshold, draft_slots):
+    start = time.perf_counter()
+    classifications = {}
+    if pre_threshold is not None:
+        for email in emails:
+            local = pre_classifier.triage(email, pre_threshold)
+            if local:
+                classifications[email["id"]] = local
+    pre_classified = set(classifications)
+    escalated = [e for e in emails if e["id"] not in pre_classified]
+
+    with tracer.span("classify", emails=len(escalated), pre_classified=len(pre_classified)):
+        if len(escalated) > 1:
+            llm_classes, _ = await classify_batch(batch_classify_func, classify_func, escalated, invoke_llm)
+            classifications.update(llm_classes)
+        elif escalated:
+            email = escalated[0]
+            classifications[email["id"]] = await invoke_llm(
+                classify_func,
+                {"subject": email["subject"], "body": email["body"]}
+            )
+    # Semantic retrieval for the whole batch is a single matrix multiply
+    related = semantic_index.search_batch([e["body"] for e in emails])
+    results = await asyncio.gather(*(
+        finish_triage(e, classifications[e["id"]], start, [topic for topic, _ in hits], draft_slots)
+        for e, hits in zip(emails, related)
+    ))
+    for email, result in zip(emails, results):
+        result["pre_classified"] = result["id"] in pre_classified
+        # Email text in the prompts this email went into, with and without thread de-duplication
+        calls_with_body = (not result["pre_classified"]) + result["needs_review"]
+        compact = estimate_tokens(email["body"])
+        result["prompt_tokens"] = {
+            "full": email.get("full_tokens", compact) * calls_with_body,
+            "compact": compact * calls_with_body + estimate_tokens(email.get("thread")) * result["needs_review"]
+        }
+    return results
+
+async def batch_main(emails, output, review_queue, concurrency=8, token_budget=3000, batch_classify=True, pre_threshold=DEFAULT_THRESHOLD):
+    """Triages emails with a bounded worker pool, streaming results as JSONL.
+
+    Emails are packed into BatchClassify prompts that fit token_budget (one
+    email per prompt when batch_classify is off); concurrency bounds the
+    batches in flight and, separately, the DraftReply calls in flight across
+    all of them. Quoted history from earlier in the stream is replaced
+    by a per-conversation summary before any prompt is built. Drafts that need approval are appended to the review
+    queue instead of waiting on the interactive approval gate.
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies = []
+    stats = {"processed": 0, "queued_for_review": 0, "errors": 0, "llm_calls": 0, "pre_classified": 0, "pre_wrong": 0,
+             "email_tokens_full": 0, "email_tokens_compact": 0}
+    threads = ThreadIndex()
+    draft_slots = asyncio.Semaphore(concurrency)
+    # Every cache miss is one LLM call; hits are free and not counted
+    misses_before = llm_cache.misses
+
+    def write(stream, record):
+        stream.write(json.dumps(record) + "\n")
+        stream.flush()
+
+    async def worker():
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            try:
+                results = await triage_batch(batch, pre_threshold, draft_slots)
+            except Exception as exc:
+                stats["errors"] += len(batch)
+                results = [{"id": e["id"], "subject": e.get("subject"), "error": str(exc)} for e in batch]
+            truth = {e["id"]: e.get("category_ground_truth") for e in batch}
+            for result in results:
+                if "latency_ms" in result:
+                    latencies.append(result["latency_ms"])
+                if "prompt_tokens" in result:
+                    stats["email_tokens_full"] += result["prompt_tokens"]["full"]
+                    stats["email_tokens_compact"] += result["prompt_tokens"]["compact"]
+                if result.get("pre_classified"):
+                    stats["pre_classified"] += 1
+                    if truth[result["id"]] and LOCAL_CLASSES.get(truth[result["id"]]) != result["classification"]:
+                        stats["pre_wrong"] += 1
+                if result.get("needs_review"):
+                    write(review_queue, result)
+                    stats["queued_for_review"] += 1
+                stats["processed"] += 1
+                write(output, result)
+
+    rejected = []
+
+    def with_ids(stream):
+        # Runs outside the workers' error handling, so a bad record is reported (by the loop, see below) rather than raised
+        for n, email in enumerate(stream):
+            problem = invalid_record(email)
+            if problem:
+                rejected.append({"id": email.get("id", n) if isinstance(email, dict) else n, "error": problem})
+                continue
+            email.setdefault("id", n)
+            threads.add(email)
+            compact = threads.compact(email)
+            compact["full_tokens"] = estimate_tokens(email["body"])
+            yield compact
+
+    started = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    batches = pack_batches(with_ids(emails), token_budget, max_batch=50 if batch_classify else 1)
+    while True:
+        # Reading (stdin can block indefinitely) and packing run on a thread, so the workers keep going meanwhile
+        batch = await asyncio.to_thread(next, batches, None)
+        for record in rejected:
+            stats["errors"] += 1
+            stats["processed"] += 1
+            write(output, record)
+        rejected.clear()
+        if batch is None:
+            break
+        await queue.put(batch)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    stats.update(
+        llm_calls=llm_cache.misses - misses_before,
+        elapsed_s=elapsed,
+        emails_per_sec=stats["processed"] / elapsed if elapsed else 0.0,
+        p50_ms=percentile(latencies, 50),
+        p95_ms=percentile(latencies, 95)
+    )
+    print(
+        f"\n--- 📊 BATCH SUMMARY ---\n"
+        f"Emails: {stats['processed']} | Review queue: {stats['queued_for_review']} | Errors: {stats['errors']} | LLM calls: {stats['llm_calls']}\n"
+        f"Throughput: {stats['emails_per_sec']:.2f} emails/sec | "
+        f"p50: {stats['p50_ms']:.0f} ms | p95: {stats['p95_ms']:.0f} ms\n"
+        f"LLM cache: {llm_cache.hits} hits / {llm_cache.misses} misses\n"
+        f"Pre-classifier: {stats['pre_classified']} answered locally | "
+        f"escalation rate: {1 - stats['pre_classified'] / stats['processed'] if stats['processed'] else 0:.1%} | "
+        f"accuracy lost vs ground truth: {stats['pre_wrong'] / stats['processed'] if stats['processed'] else 0:.2%}\n"
+        f"Thread de-duplication: {stats['email_tokens_full']} → {stats['email_tokens_compact']} email tokens "
+        f"({stats['email_tokens_full'] / max(1, stats['processed']):.1f} → {stats['email_tokens_compact'] / max(1, stats['processed']):.1f} per email)",
+        file=sys.stderr
+    )
+    for stage, row in tracer.stage_stats().items():
+        print(f"   {stage:<22} n={row['count']:<6} p50={row['p50_ms']:>8.1f} ms  p95={row['p95_ms']:>8.1f} ms  tokens={row['tokens']}", file=sys.stderr)
+    return stats
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TriageFlow CLI")
+    parser.add_argument("--batch", metavar="FILE", help="Headless mode: triage emails from a JSONL file ('-' for stdin)")
+    parser.add_argument("--mock", type=int, metavar="N", help="Headless mode over N generated mock emails")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max classification batches, and separately drafts, in flight (default: 8)")
+    parser.add_argument("--token-budget", type=int, default=3000, help="Approximate prompt tokens per BatchClassify call (default: 3000)")
+    parser.add_argument("--single-classify", action="store_true", help="Classify one email per LLM call instead of batching")
+    parser.add_argument("--pre-threshold", type=float, default=DEFAULT_THRESHOLD, help=f"Confidence needed to skip the LLM for Spam/FYI (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--pre-classify", action="store_true", help="Also answer confident Spam/FYI locally for --batch input (on by default only for --mock: the model is trained on the mock templates)")
+    parser.add_argument("--no-pre-classify", action="store_true", help="Send every email to the LLM classifier")
+    parser.add_argument("--trace", metavar="FILE", help="Write per-stage spans as OpenTelemetry (OTLP/JSON) to FILE")
+    parser.add_argument("--output", default="-", help="Where to write result JSONL (default: stdout)")
+    parser.add_argument("--review-queue", default="review_queue.jsonl", help="JSONL file that collects drafts awaiting approval")
+    return parser.parse_args(argv)
+
+def run_batch(args):
+    emails = generate_mock_emails(args.mock) if args.mock else read_emails(args.batch)
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        with open(args.review_queue, "a", encoding="utf-8") as review_queue:
+            asyncio.run(batch_main(
+                emails, output, review_queue, max(1, args.concurrency),
+                token_budget=args.token_budget, batch_classify=not args.single_classify,
+                pre_threshold=args.pre_threshold if (args.mock or args.pre_classify) and not args.no_pre_classify else None
+            ))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if args.trace:
+            print(f"Trace written to {tracer.export(args.trace)}", file=sys.stderr)
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    if args.batch or args.mock:
+        run_batch(args)
+    else:
+        asyncio.run(main())
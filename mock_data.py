@@ -1,4 +1,5 @@
 import random
+from collections import deque
 from datetime import datetime, timedelta
 
 # 1. The Knowledge Graph (RAG Source)
@@ -11,6 +12,17 @@ knowledge_base = {
     "Hiring Freeze": "POLICY: No new FTE hires until Q1. Contractors are allowed for critical projects."
 }
 
+# 1b. Dated policy versions (Temporal Intelligence source)
+# Conflicting versions of the same topic; the active one is resolved by date, not by wording.
+policy_versions = [
+    {"topic": "Travel Policy", "effective": "2020-01-01", "expires": "2025-01-01",
+     "text": "OLD POLICY: Economy class only for all domestic flights. No exceptions."},
+    {"topic": "Travel Policy", "effective": "2025-01-01", "expires": None,
+     "text": "ACTIVE: Business class approved for flights over 4 hours. Book through Concur."}
+]
+for _policy in policy_versions:
+    knowledge_base[f"{_policy['topic']} ({_policy['effective'][:4]})"] = _policy["text"]
+
 # 2. Templates for Procedural Generation
 templates = {
     "Spam": [
@@ -35,13 +47,14 @@ templates = {
         ("Approval Needed: New Hire", "Can we proceed with the offer for the Senior Dev? (Ref: Hiring Freeze)"),
         ("Urgent: Project Alpha Update?", "Clients are asking about the downtime. What do I tell them?"),
         ("Budget Question", "Can I book a flight to the conf? It's $1,200. (Ref: Q3 Budget)"),
-        ("Press Inquiry: Merger", "Reporter asking for comment on the acquisition rumors. Advice?")
+        ("Press Inquiry: Merger", "Reporter asking for comment on the acquisition rumors. Advice?"),
+        ("Travel Request: NY to LA", "Can I fly business class to the LA client summit? Checking the Travel Policy.")
     ]
 }
 
-def generate_mock_emails(count=300):
-    """Generates a weighted list of emails simulating an inbox."""
-    emails = []
+def iter_mock_emails(count=300):
+    """Yields a weighted stream of emails simulating an inbox (only the last few are kept for reply chains)."""
+    recent = deque(maxlen=5)
     
     # Distribution: 20% Spam, 30% FYI, 20% Important, 30% Actionable
     weights = [0.2, 0.3, 0.2, 0.3]
@@ -49,6 +62,7 @@ def generate_mock_emails(count=300):
     
     # Generate
     chosen_categories = random.choices(categories, weights=weights, k=count)
+    now = datetime.now()
     
     for i, category in enumerate(chosen_categories):
         template = random.choice(templates[category])
@@ -57,7 +71,7 @@ def generate_mock_emails(count=300):
         # Simulate Threading/Context for "Actionable" items
         # (e.g., referring to a previous email in the loop)
         if category == "Actionable" and i > 5:
-            prev_email = emails[i-random.randint(1, 5)]
+            prev_email = recent[-random.randint(1, 5)]
             # Create a "Reply" chain simulation
             if "Ref:" not in template[0]: 
                 body = f"{template[1]}\n\n> Previous Context: Regarding '{prev_email['subject']}' sent earlier..."
@@ -72,8 +86,14 @@ def generate_mock_emails(count=300):
             "sender": f"user{random.randint(1,50)}@example.com",
             "subject": f"{subject_prefix}{template[0]}",
             "body": body,
-            "received": (datetime.now() - timedelta(minutes=i*5)).strftime("%H:%M")
+            "received": (now - timedelta(minutes=i*5)).strftime("%H:%M")
         }
-        emails.append(email)
-        
-    return emails
\ No newline at end of file
+        recent.append(email)
+        yield email
+
+def generate_mock_emails(count=300):
+    """Generates a weighted list of emails simulating an inbox."""
+    return list(iter_mock_emails(count))
+
+# 3. Small sample inbox for the interactive CLI demo (main.py)
+incoming_emails = generate_mock_emails(5)
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import random
+import re
+from collections import Counter
+
+from pydantic import PrivateAttr
+from semantic_kernel.connectors.ai.chat_completion_client_base import ChatCompletionClientBase
+from semantic_kernel.contents import AuthorRole, ChatMessageContent, StreamingChatMessageContent
+from semantic_kernel.exceptions import ServiceResponseException
+
+SPAM_WORDS = ("sale", "webinar", "synergy", "searches", "free", "discount")
+FYI_WORDS = ("no action", "reminder", "patching", "out of office", "digest", "fyi")
+HIGH_WORDS = ("urgent", "approval", "approve", "deadline", "asap", "crisis", "?", "can i", "can we")
+
+
+def classify_text(text):
+    """Deterministic keyword stand-in for the ClassifyEmail model."""
+    lowered = text.lower()
+    if any(w in lowered for w in SPAM_WORDS):
+        return "Urgency: Low | Intent: Spam"
+    if any(w in lowered for w in FYI_WORDS):
+        return "Urgency: Low | Intent: FYI"
+    if any(w in lowered for w in HIGH_WORDS):
+        return "Urgency: High | Intent: Action"
+    return "Urgency: Low | Intent: FYI"
+
+
+def respond(prompt):
+    """Returns (kind, text) for a TriagePlugin prompt."""
+    if "### EMAIL" in prompt:
+        blocks = re.split(r"^### EMAIL (\S+)\s*$", prompt, flags=re.MULTILINE)[1:]
+        lines = [f"{eid} => {classify_text(body)}" for eid, body in zip(blocks[::2], blocks[1::2])]
+        return "BatchClassify", "\n".join(lines)
+    if prompt.lstrip().lower().startswith("analyze"):
+        body = prompt.split("Rules:")[0].split("Return ONLY")[0]
+        return "ClassifyEmail", classify_text(body)
+    if prompt.startswith("Extract task"):
+        return "ExtractTask", "Task: Follow up on the request | Who: Me | Due: Friday"
+    if prompt.startswith("Rewrite this draft"):
+        return "RefineDraft", "Revised per your feedback: thanks, confirmed. I will follow up by Friday. Best, [Your Name]"
+    return "DraftReply", ("Thanks for flagging this. I have reviewed the details against current policy and "
+                          "we can proceed as outlined; I will confirm next steps by end of day. Best, [Your Name]")
+
+
+class MockRateLimitError(ServiceResponseException):
+    """Injected failure shaped like a throttled Azure response, so llm_client retries it."""
+
+    status_code = 429
+    headers = {"retry-after-ms": "50"}
+
+
+class MockChatCompletion(ChatCompletionClientBase):
+    """Offline chat-completion service that can be registered in place of AzureChatCompletion.
+
+    Latency to the first token is log-normal around latency_ms; the rest of
+    the answer arrives at tokens_per_sec. error_rate injects 429s. All
+    randomness is seeded per prompt and attempt, so a run is reproducible
+    regardless of how concurrent calls interleave and a retry can succeed. Responses come from respond().
+    """
+
+    latency_ms: float = 200.0
+    latency_sigma: float = 0.5
+    tokens_per_sec: float = 80.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+    _calls: Counter = PrivateAttr(default_factory=Counter)
+    _tokens: Counter = PrivateAttr(default_factory=Counter)
+    _attempts: Counter = PrivateAttr(default_factory=Counter)
+
+    def __init__(self, service_id="default", ai_model_id="mock-gpt-4o", **settings):
+        super().__init__(service_id=service_id, ai_model_id=ai_model_id, **settings)
+
+    @classmethod
+    def from_env(cls, service_id="default"):
+        """Reads TRIAGEFLOW_MOCK_* variables (LATENCY_MS, LATENCY_SIGMA, TOKENS_PER_SEC, ERROR_RATE, SEED)."""
+        settings = {}
+        for field, cast in (("latency_ms", float), ("latency_sigma", float), ("tokens_per_sec", float),
+                            ("error_rate", float), ("seed", int)):
+            value = os.getenv(f"TRIAGEFLOW_MOCK_{field.upper()}")
+            if value is not None:
+                settings[field] = cast(value)
+        return cls(service_id=service_id, **settings)
+
+    def stats(self):
+        return {"calls": dict(self._calls), "total_calls": sum(self._calls.values()), "tokens": dict(self._tokens)}
+
+    def reset_stats(self):
+        self._calls.clear()
+        self._tokens.clear()
+        self._attempts.clear()
+
+    def _plan(self, chat_history):
+        prompt = chat_history.messages[-1].content if chat_history.messages else ""
+        kind, text = respond(prompt)
+        rng = random.Random(f"{self.seed}:{prompt}:{self._attempts[prompt]}")
+        self._attempts[prompt] += 1
+        self._calls[kind] += 1
+        self._tokens["prompt"] += len(prompt) // 4 + 1
+        self._tokens["completion"] += len(text.split())
+        if rng.random() < self.error_rate:
+            raise MockRateLimitError(f"Mock LLM injected failure for {kind} (HTTP 429)")
+        first_token_s = rng.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000
+        return text, first_token_s
+
+    async def _inner_get_chat_message_contents(self, chat_history, settings):
+        text, first_token_s = self._plan(chat_history)
+        await asyncio.sleep(first_token_s + len(text.split()) / self.tokens_per_sec)
+        return [ChatMessageContent(role=AuthorRole.ASSISTANT, content=text, ai_model_id=self.ai_model_id)]
+
+    async def _inner_get_streaming_chat_message_contents(self, chat_history, settings, function_invoke_attempt=0):
+        text, first_token_s = self._plan(chat_history)
+        await asyncio.sleep(first_token_s)
+        for i, word in enumerate(text.split(" ")):
+            if i:
+                await asyncio.sleep(1 / self.tokens_per_sec)
+            yield [StreamingChatMessageContent(
+                role=AuthorRole.ASSISTANT, content=word if i == 0 else " " + word,
+                choice_index=0, ai_model_id=self.ai_model_id
+            )]
@@ -0,0 +1,103 @@
+import bisect
+import threading
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from kb_index import topic_of
+
+
+class PolicyVersion(NamedTuple):
+    topic: str
+    key: str
+    text: str
+    effective: datetime
+    expires: Optional[datetime] = None
+
+
+def parse_date(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+class PolicyStore:
+    """Versioned policies with an interval index per topic.
+
+    Versions of a topic are kept sorted by effective date, so "which version of
+    topic X is active at time T" is a binary search: the latest version that
+    took effect at or before T, unless that version has expired. A newer
+    version supersedes older ones from its effective date on.
+
+    Readers may run on other threads than add() (the app resolves policies on
+    its event loop while a new version is published from the script thread):
+    add() builds a topic's new (starts, versions) pair and swaps it in with
+    one assignment, so a reader sees either the old index or the new one.
+    """
+
+    def __init__(self):
+        self._topics = {}
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base, policy_versions=()):
+        """Dated entries come from policy_versions; every other KB entry is a single, always-active version."""
+        store = cls()
+        dated_keys = set()
+        for record in policy_versions:
+            version = PolicyVersion(
+                topic=record["topic"],
+                key=record.get("key") or f"{record['topic']} ({record['effective'][:4]})",
+                text=record["text"],
+                effective=parse_date(record["effective"]),
+                expires=parse_date(record.get("expires")),
+            )
+            dated_keys.add(version.key)
+            store.add(version)
+        for key, text in knowledge_base.items():
+            if key not in dated_keys:
+                store.add(PolicyVersion(topic=topic_of(key), key=key, text=text, effective=datetime.min))
+        return store
+
+    def add(self, version):
+        """Inserts one version (copy-on-write for its topic); no rebuild of the other topics."""
+        with self._lock:
+            starts, versions = self._topics.get(version.topic, ((), ()))
+            position = bisect.bisect_right(starts, version.effective)
+            self._topics[version.topic] = (
+                (*starts[:position], version.effective, *starts[position:]),
+                (*versions[:position], version, *versions[position:]),
+            )
+            self._by_key[version.key] = version
+
+    def active(self, topic, at=None):
+        """The version of topic in force at time at (default: now), or None."""
+        starts, versions = self._topics.get(topic, ((), ()))
+        if not starts:
+            return None
+        at = at or datetime.now()
+        position = bisect.bisect_right(starts, at) - 1
+        if position < 0:
+            return None
+        version = versions[position]
+        if version.expires is not None and at >= version.expires:
+            return None
+        return version
+
+    def is_versioned(self, topic):
+        """True when the topic has more than one dated version, i.e. picking one is a temporal decision."""
+        return len(self._topics.get(topic, ((), ()))[1]) > 1
+
+    def resolve(self, keys, at=None):
+        """Maps retrieved KB keys to the distinct versions active at time at, in retrieval order."""
+        resolved, seen = [], set()
+        for key in keys:
+            version = self._by_key.get(key)
+            topic = version.topic if version else topic_of(key)
+            if topic in seen:
+                continue
+            seen.add(topic)
+            active = self.active(topic, at)
+            if active is not None:
+                resolved.append(active)
+        return resolved
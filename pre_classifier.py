@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import random
+import re
+import zlib
+import numpy as np
+
+from mock_data import generate_mock_emails, templates
+
+DEFAULT_MODEL_PATH = os.path.join(os.getenv("TRIAGEFLOW_INDEX_DIR", ".triageflow_index"), "pre_classifier.npz")
+DEFAULT_THRESHOLD = float(os.getenv("TRIAGEFLOW_PRECLASSIFY_THRESHOLD", "0.9"))
+
+CATEGORIES = ["Spam", "FYI", "Important", "Actionable"]
+
+# Only noise is answered locally; anything that might need a reply goes to the LLM.
+# The strings mirror the ClassifyEmail output format so downstream branching is unchanged.
+LOCAL_CLASSES = {
+    "Spam": "Urgency: Low | Intent: Spam",
+    "FYI": "Urgency: Low | Intent: FYI",
+}
+
+TOKEN = re.compile(r"[a-z0-9$]+")
+# Bump when feature_ids changes what it extracts, so saved models are retrained
+FEATURES_VERSION = 1
+TRAINING = {"dim": 1 << 14, "epochs": 8, "learning_rate": 0.5, "seed": 0}
+
+
+def feature_ids(subject, body, dim):
+    """Hashed unigram/bigram ids; subject tokens are kept apart from body tokens."""
+    ids = [0]  # bias
+    for field, text in (("s", subject), ("b", body)):
+        words = TOKEN.findall(text.lower())
+        for i, word in enumerate(words):
+            ids.append(1 + zlib.crc32(f"{field}:{word}".encode("utf-8")) % (dim - 1))
+            if i:
+                ids.append(1 + zlib.crc32(f"{field}:{words[i - 1]} {word}".encode("utf-8")) % (dim - 1))
+    return np.array(ids, dtype=np.int64)
+
+
+class PreClassifier:
+    """Hashed n-gram features + multinomial logistic regression, for obvious Spam/FYI.
+
+    Prediction is a gather-and-sum over a (classes x dim) weight matrix, so it
+    costs microseconds. Trained on the category_ground_truth labels that
+    generate_mock_emails emits, so it only knows the mock templates: main.py
+    enables it by default for --mock input but not for real --batch mail.
+    """
+
+    def __init__(self, weights):
+        self.weights = weights
+
+    @classmethod
+    def train(cls, emails, dim=1 << 14, epochs=8, learning_rate=0.5, seed=0):
+        rng = random.Random(seed)
+        weights = np.zeros((len(CATEGORIES), dim), dtype=np.float32)
+        samples = [(feature_ids(e["subject"], e["body"], dim), CATEGORIES.index(e["category_ground_truth"])) for e in emails]
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1 + epoch)
+            for ids, label in samples:
+                probs = _softmax(weights[:, ids].sum(axis=1))
+                probs[label] -= 1.0
+                np.add.at(weights, (slice(None), ids), -rate * probs[:, None])
+        return cls(weights)
+
+    @classmethod
+    def load_or_train(cls, path=DEFAULT_MODEL_PATH, training_size=2000):
+        """The model saved at path if it was trained on the current templates and parameters, else a new one."""
+        expected = model_fingerprint(training_size)
+        try:
+            saved = np.load(path)
+            if saved["fingerprint"].item() == expected:
+                return cls(saved["weights"])
+        except (OSError, KeyError, ValueError):
+            pass
+        # Seeded, without disturbing the global random state the app relies on
+        state = random.getstate()
+        random.seed(0)
+        try:
+            emails = generate_mock_emails(training_size)
+        finally:
+            random.setstate(state)
+        model = cls.train(emails, **TRAINING)
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            np.savez(path, weights=model.weights, fingerprint=np.array(expected))
+        except OSError:
+            pass
+        return model
+
+    def predict(self, email):
+        """Returns (category, confidence)."""
+        probs = _softmax(self.weights[:, feature_ids(email["subject"], email["body"], self.weights.shape[1])].sum(axis=1))
+        best = int(probs.argmax())
+        return CATEGORIES[best], float(probs[best])
+
+    def triage(self, email, threshold=DEFAULT_THRESHOLD):
+        """Local classification string for confident Spam/FYI, or None to escalate to the LLM."""
+        category, confidence = self.predict(email)
+        if category in LOCAL_CLASSES and confidence >= threshold:
+            return LOCAL_CLASSES[category]
+        return None
+
+
+def model_fingerprint(training_size):
+    """Digest of everything a trained model depends on: the mock templates, features and training parameters."""
+    payload = json.dumps({
+        "templates": templates,
+        "categories": CATEGORIES,
+        "token": TOKEN.pattern,
+        "features": FEATURES_VERSION,
+        "training": TRAINING,
+        "training_size": training_size,
+    }, sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _softmax(scores):
+    scores = scores - scores.max()
+    exp = np.exp(scores)
+    return exp / exp.sum()
+
+
+def evaluate(model, emails, threshold=DEFAULT_THRESHOLD):
+    """Escalation rate and accuracy lost versus ground truth for emails answered locally."""
+    escalated = wrong = 0
+    for email in emails:
+        category, confidence = model.predict(email)
+        if category not in LOCAL_CLASSES or confidence < threshold:
+            escalated += 1
+        elif category != email["category_ground_truth"]:
+            wrong += 1
+    total = len(emails) or 1
+    return {"emails": len(emails), "escalation_rate": escalated / total, "accuracy_lost": wrong / total}
@@ -0,0 +1,145 @@
+import heapq
+import itertools
+import threading
+
+PENDING, CLASSIFYING, READY, FAILED = "pending", "classifying", "ready", "failed"
+
+# Lower rank runs first: the open email, then its neighbours, then everything else newest first
+SELECTED, NEIGHBOR, BACKGROUND = 0, 1, 2
+
+
+class PrefetchScheduler:
+    """Pre-triages an inbox in the background so analysis is ready before it is requested.
+
+    Work runs as `concurrency` worker coroutines on an existing event loop
+    (the app's long-lived loop). The Streamlit script thread only calls
+    submit()/focus()/take_ready()/close(), which are thread-safe. The priority
+    queue is a heap with lazy invalidation: reprioritizing pushes a fresh entry
+    and stale entries are skipped when popped. Workers exit once the queue is
+    empty (so an idle scheduler holds no task on the loop, and nothing keeps
+    its emails alive) and are started again by the next submit() or focus().
+    """
+
+    def __init__(self, loop, run_pipeline, concurrency=3):
+        self.loop = loop
+        self.run_pipeline = run_pipeline
+        self.concurrency = concurrency
+        self.states = {}
+        self._emails = {}
+        self._order = {}
+        self._priority = {}
+        self._boosted = set()
+        self._heap = []
+        self._ready = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._closed = False
+
+    def submit(self, emails, *args):
+        """Queues emails (newest first, i.e. inbox order) with the extra pipeline args."""
+        with self._lock:
+            if self._closed:
+                return
+            for position, email in enumerate(emails):
+                eid = email["id"]
+                if eid in self.states:
+                    continue
+                self._emails[eid] = (email, args)
+                self._order[eid] = position
+                self.states[eid] = PENDING
+                self._push(eid, BACKGROUND)
+        self._wake()
+
+    def focus(self, eid, neighbor_ids=()):
+        """Moves the selected email and its neighbours to the front of the queue."""
+        near = {eid, *neighbor_ids}
+        with self._lock:
+            # Whatever is no longer near the selection goes back to inbox order
+            for other in self._boosted - near:
+                if self.states.get(other) == PENDING:
+                    self._push(other, BACKGROUND)
+            self._boosted = set()
+            for other, rank in [(eid, SELECTED)] + [(n, NEIGHBOR) for n in neighbor_ids]:
+                if self.states.get(other) == PENDING:
+                    self._boosted.add(other)
+                    if self._priority[other][0] != rank:
+                        self._push(other, rank)
+        self._wake()
+
+    def discard(self, eid):
+        """Stops tracking an email that was analyzed some other way."""
+        with self._lock:
+            if eid in self.states:
+                self.states[eid] = READY
+            self._ready.pop(eid, None)
+
+    def take_ready(self):
+        """Returns and forgets results finished since the last call."""
+        with self._lock:
+            ready, self._ready = self._ready, {}
+        return ready
+
+    def close(self):
+        """Cancels the workers and drops the queued emails; later submit() calls are ignored."""
+        with self._lock:
+            self._closed = True
+            self._heap = []
+            self._emails = {}
+        try:
+            self.loop.call_soon_threadsafe(self._cancel)
+        except RuntimeError:
+            pass  # the loop is already closed, and its tasks with it
+
+    def busy(self):
+        with self._lock:
+            return any(state in (PENDING, CLASSIFYING) for state in self.states.values())
+
+    # --- Loop side ---
+    def _push(self, eid, rank):
+        priority = (rank, self._order[eid], next(self._seq))
+        self._priority[eid] = priority
+        heapq.heappush(self._heap, (priority, eid))
+
+    def _pop(self):
+        with self._lock:
+            while self._heap:
+                priority, eid = heapq.heappop(self._heap)
+                if self.states.get(eid) == PENDING and self._priority.get(eid) == priority:
+                    self.states[eid] = CLASSIFYING
+                    return eid, self._emails[eid]
+        return None, None
+
+    def _wake(self):
+        self.loop.call_soon_threadsafe(self._start)
+
+    def _start(self):
+        """Tops the worker pool back up to `concurrency` while there is queued work."""
+        with self._lock:
+            if self._closed or not self._heap:
+                return
+        while len(self._workers) < self.concurrency:
+            task = self.loop.create_task(self._worker())
+            self._workers.add(task)
+            task.add_done_callback(self._workers.discard)
+
+    def _cancel(self):
+        for task in list(self._workers):
+            task.cancel()
+
+    async def _worker(self):
+        while True:
+            eid, job = self._pop()
+            if job is None:
+                return
+            email, args = job
+            try:
+                result = await self.run_pipeline(email, *args)
+            except Exception:
+                with self._lock:
+                    self.states[eid] = FAILED
+                continue
+            with self._lock:
+                if self.states.get(eid) == CLASSIFYING:
+                    self.states[eid] = READY
+                    self._ready[eid] = result
@@ -0,0 +1,119 @@
+import bisect
+import re
+from array import array
+import numpy as np
+
+TOKEN = re.compile(r"[a-z0-9$]+")
+FILTER = re.compile(r"^(class|status):(\S+)$", re.IGNORECASE)
+UNANALYZED = "pending"
+
+
+class SearchIndex:
+    """Incremental inverted index over sender/subject/body, with class/status facets.
+
+    Documents get ordinals in the order they are added (inbox order), so each
+    term's posting list is an append-only, already-sorted array('I'). Queries
+    read the postings as zero-copy NumPy views and combine them in a boolean
+    mask over all documents, which keeps a query in the low milliseconds at
+    100k emails. Every query word is a prefix match, resolved by bisecting the
+    sorted vocabulary; terms first seen since the last query are collected
+    unsorted and merged in on the next prefix lookup, so indexing stays linear.
+
+    The triage class and status change after an email is analyzed, so they are
+    kept as per-document codes into small intern tables rather than as postings:
+    update() rewrites two integers.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self._ordinal = {}
+        self._postings = {}
+        self._vocabulary = []
+        self._new_terms = []
+        self._facets = {name: ([], {}, array("H")) for name in ("class", "status")}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, email, analysis=None):
+        """Indexes a newly arrived email; returns its ordinal."""
+        ordinal = len(self.ids)
+        self.ids.append(email["id"])
+        self._ordinal[email["id"]] = ordinal
+        text = f"{email['sender']} {email['subject']} {email['body']}".lower()
+        for term in set(TOKEN.findall(text)):
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = array("I")
+                self._new_terms.append(term)
+            postings.append(ordinal)
+        for name, value in self._facet_values(analysis).items():
+            self._facets[name][2].append(self._intern(name, value))
+        return ordinal
+
+    def update(self, eid, analysis):
+        """Re-indexes an email's class and status after (re-)analysis or a status change."""
+        ordinal = self._ordinal.get(eid)
+        if ordinal is None:
+            return
+        for name, value in self._facet_values(analysis).items():
+            self._facets[name][2][ordinal] = self._intern(name, value)
+
+    def search(self, query):
+        """Sorted ordinals matching every word and filter in `query`, or None for an empty query.
+
+        Words match as prefixes ("trav" finds "travel"); `class:High`,
+        `class:Spam`, `status:completed` or `status:pending` (not yet analyzed)
+        filter on the triage result.
+        """
+        words, filters = [], []
+        for part in query.split():
+            match = FILTER.match(part)
+            if match:
+                filters.append((match.group(1).lower(), match.group(2).lower()))
+            else:
+                words.extend(TOKEN.findall(part.lower()))
+        if not words and not filters:
+            return None
+
+        mask = np.ones(len(self.ids), dtype=bool)
+        for word in words:
+            mask &= self._prefix_mask(word)
+        for name, value in filters:
+            mask &= self._facet_mask(name, value)
+        return np.flatnonzero(mask)
+
+    def _prefix_mask(self, prefix):
+        mask = np.zeros(len(self.ids), dtype=bool)
+        if self._new_terms:
+            # Timsort merges the sorted vocabulary with the appended run
+            self._new_terms.sort()
+            self._vocabulary.extend(self._new_terms)
+            self._vocabulary.sort()
+            self._new_terms = []
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            mask[np.frombuffer(self._postings[term], dtype=np.uint32)] = True
+        return mask
+
+    def _facet_mask(self, name, value):
+        values, _, codes = self._facets[name]
+        # class:high matches "Urgency: High | Intent: Action"; class:act matches it too
+        wanted = [code for code, label in enumerate(values)
+                  if any(token.startswith(value) for token in TOKEN.findall(label))]
+        return np.isin(np.frombuffer(codes, dtype=np.uint16), wanted)
+
+    def _intern(self, name, value):
+        values, codes, _ = self._facets[name]
+        if value not in codes:
+            codes[value] = len(values)
+            values.append(value)
+        return codes[value]
+
+    @staticmethod
+    def _facet_values(analysis):
+        if not analysis:
+            return {"class": "", "status": UNANALYZED}
+        return {"class": analysis.get("class", "").lower(), "status": analysis.get("status", "active")}
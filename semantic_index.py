@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import re
+import zlib
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.getenv("TRIAGEFLOW_INDEX_DIR", ".triageflow_index")
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do for from has have i in is it its me my no not of on or our "
+    "please the this to we what will with you your".split()
+)
+
+
+def features(text):
+    """Word tokens plus in-word character 4-grams, so 'inquiry' and 'inquiries' still overlap."""
+    for word in TOKEN.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        yield word
+        padded = f"<{word}>"
+        for i in range(len(padded) - 3):
+            yield padded[i:i + 4]
+
+
+def hash_vectors(texts, dim):
+    """Raw term-frequency matrix using a stable hash (Python's str hash is salted per process)."""
+    counts = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for feature in features(text):
+            counts[row, zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    return counts
+
+
+class SemanticIndex:
+    """Hashed TF-IDF embeddings of knowledge-base entries for local, offline top-k search.
+
+    Every entry is one L2-normalized row of a float32 matrix; scoring a query
+    against the whole KB is a single matrix-vector product, and scoring a batch
+    of emails is a single matrix multiply. The matrix is saved as .npy and
+    memory-mapped on load.
+    """
+
+    def __init__(self, keys, matrix, idf):
+        self.keys = keys
+        self.matrix = matrix
+        self.idf = idf
+
+    @classmethod
+    def build(cls, knowledge_base, dim=4096):
+        keys = list(knowledge_base)
+        tf = hash_vectors([f"{k} {v}" for k, v in knowledge_base.items()], dim)
+        document_freq = (tf > 0).sum(axis=0)
+        idf = (np.log((1 + len(keys)) / (1 + document_freq)) + 1).astype(np.float32)
+        return cls(keys, _normalize(tf * idf), idf)
+
+    @staticmethod
+    def fingerprint(knowledge_base, dim):
+        payload = json.dumps({"kb": knowledge_base, "dim": dim}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def load_or_build(cls, knowledge_base, index_dir=DEFAULT_INDEX_DIR, dim=4096):
+        """Memory-maps a previously saved index for this exact KB, or builds and saves one."""
+        base = os.path.join(index_dir, cls.fingerprint(knowledge_base, dim))
+        try:
+            with open(base + ".keys.json", encoding="utf-8") as f:
+                keys = json.load(f)
+            return cls(keys, np.load(base + ".matrix.npy", mmap_mode="r"), np.load(base + ".idf.npy"))
+        except (OSError, ValueError):
+            pass
+
+        index = cls.build(knowledge_base, dim)
+        try:
+            os.makedirs(index_dir, exist_ok=True)
+            np.save(base + ".matrix.npy", index.matrix)
+            np.save(base + ".idf.npy", index.idf)
+            with open(base + ".keys.json", "w", encoding="utf-8") as f:
+                json.dump(index.keys, f)
+        except OSError:
+            pass  # Read-only disk: keep the in-memory index
+        return index
+
+    def embed(self, texts):
+        return _normalize(hash_vectors(texts, self.matrix.shape[1]) * self.idf)
+
+    def search_batch(self, texts, k=3, min_score=0.15):
+        """Top-k (key, score) pairs for each text, scored with one matmul."""
+        if not texts or not self.keys:
+            return [[] for _ in texts]
+        scores = self.embed(texts) @ self.matrix.T
+        k = min(k, len(self.keys))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ranked = sorted(candidates, key=lambda c: -scores[row, c])
+            results.append([(self.keys[c], float(scores[row, c])) for c in ranked if scores[row, c] >= min_score])
+        return results
+
+    def search(self, text, k=3, min_score=0.15):
+        return self.search_batch([text], k, min_score)[0]
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,54 @@
+import hashlib
+import inspect
+import json
+import threading
+from collections import Counter, OrderedDict
+
+DEFAULT_MAX_ENTRIES = 20_000
+
+
+def fingerprint(inputs):
+    """Stable digest of a stage's inputs (any JSON-serializable structure)."""
+    payload = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class StageMemo:
+    """Pipeline stage outputs memoized against the exact inputs of each stage.
+
+    The pipeline names what every stage reads (the email text for classify,
+    the resolved policies for the context, body + context + style for the
+    draft), so re-running it after a change only recomputes the stages
+    whose inputs moved: a new reply style reaches DraftReply alone, a policy
+    update only the emails that retrieved that topic. In memory and LRU
+    bounded; LLM answers are additionally kept in the persistent LLM cache.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    async def run(self, stage, inputs, compute):
+        """(value, reused): the memoized output for these inputs, else compute() (sync or async)."""
+        key = (stage, fingerprint(inputs))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits[stage] += 1
+                return self._entries[key], True
+        value = compute()
+        if inspect.isawaitable(value):
+            value = await value
+        with self._lock:
+            self.misses[stage] += 1
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value, False
+
+    def stats(self):
+        return {stage: {"reused": self.hits[stage], "computed": self.misses[stage]}
+                for stage in sorted(set(self.hits) | set(self.misses))}
@@ -0,0 +1,124 @@
+import re
+import textwrap
+from itertools import islice
+
+QUOTE_REF = re.compile(r"Regarding '(.+?)'")
+REPLY_PREFIX = re.compile(r"^\s*(?:(?:re|fw|fwd)\s*:\s*)+", re.IGNORECASE)
+ATTRIBUTION = re.compile(r"^On .+ wrote:$")
+
+
+def normalize_subject(subject):
+    """Conversation key: the subject without Re:/Fwd: prefixes, case or surrounding space."""
+    return REPLY_PREFIX.sub("", subject).strip().lower()
+
+
+def split_quoted(body):
+    """(fresh text, quoted lines): lines starting with '>' and "On ... wrote:" headers are quoted history."""
+    fresh, quoted = [], []
+    for line in body.splitlines():
+        stripped = line.strip()
+        if stripped.startswith(">") or ATTRIBUTION.match(stripped):
+            quoted.append(stripped)
+        else:
+            fresh.append(line)
+    return "\n".join(fresh).strip(), quoted
+
+
+class Conversation:
+    """What compaction needs to know about one thread, kept up to date as messages join it."""
+
+    __slots__ = ("subject", "snippet", "count", "senders", "fresh_lines")
+
+    def __init__(self, root, snippet_chars):
+        self.subject = root["subject"]
+        self.snippet = textwrap.shorten(split_quoted(root["body"])[0], snippet_chars, placeholder="…")
+        self.count = 0
+        self.senders = {}
+        # Stripped fresh line -> id of the message that wrote it (None once several have)
+        self.fresh_lines = {}
+
+    def add(self, email, fresh):
+        self.count += 1
+        self.senders.setdefault((email.get("sender") or "unknown").split("@")[0], None)
+        for line in fresh.splitlines():
+            line = line.strip()
+            if line:
+                self.fresh_lines[line] = email["id"] if self.fresh_lines.get(line, email["id"]) == email["id"] else None
+
+
+class ThreadIndex:
+    """Groups emails into conversations so quoted history is paid for once per thread.
+
+    An email carrying a `thread_id` (e.g. a mail API's conversation id) is
+    filed under it. Otherwise a reply joins the conversation of the message it
+    quotes (matched by normalized subject), and anything else starts or joins
+    the conversation of its own subject. compact() drops quoted lines whose source is already in the
+    index and stands in one short summary of the conversation instead, which
+    is cached per conversation until a new message joins it. Senders, message
+    count, root snippet and fresh lines are tracked per conversation as
+    messages arrive, so neither a summary nor a quote check grows with the
+    length of the thread.
+    """
+
+    def __init__(self, snippet_chars=80):
+        self.snippet_chars = snippet_chars
+        self.conversations = {}
+        self.thread_of = {}
+        self._summaries = {}
+        self.summary_hits = 0
+        self.summary_misses = 0
+
+    def add(self, email):
+        """Files an email under its conversation; returns the conversation key."""
+        fresh, quoted = split_quoted(email["body"])
+        key = email.get("thread_id")
+        if key is None:
+            for line in quoted:
+                ref = QUOTE_REF.search(line)
+                if ref and normalize_subject(ref.group(1)) in self.conversations:
+                    key = normalize_subject(ref.group(1))
+                    break
+            key = key or normalize_subject(email["subject"])
+        conversation = self.conversations.get(key)
+        if conversation is None:
+            conversation = self.conversations[key] = Conversation(email, self.snippet_chars)
+        conversation.add(email, fresh)
+        self.thread_of[email["id"]] = key
+        return key
+
+    def compact(self, email):
+        """Copy of `email` whose body keeps only fresh text and unseen quotes.
+
+        `thread` holds the conversation summary when quoted history was
+        removed (so the model still knows what is being replied to), else "".
+        """
+        key = self.thread_of.get(email["id"]) or self.add(email)
+        fresh, quoted = split_quoted(email["body"])
+        kept = [line for line in quoted if not self._seen(line, key, email)]
+        body = "\n".join([fresh] + kept) if kept else fresh
+        return {**email, "body": body, "thread": self.summary(key) if len(kept) < len(quoted) else ""}
+
+    def summary(self, key):
+        conversation = self.conversations[key]
+        cached = self._summaries.get(key)
+        if cached and cached[0] == conversation.count:
+            self.summary_hits += 1
+            return cached[1]
+        self.summary_misses += 1
+        senders = list(islice(conversation.senders, 3))
+        extra = len(conversation.senders) - len(senders)
+        who = ", ".join(senders) + (f" +{extra}" if extra else "")
+        text = f"Thread '{conversation.subject}' ({conversation.count} msgs; {who}): {conversation.snippet}"
+        self._summaries[key] = (conversation.count, text)
+        return text
+
+    def _seen(self, line, key, email):
+        ref = QUOTE_REF.search(line)
+        if ref:
+            return normalize_subject(ref.group(1)) in self.conversations
+        text = line.lstrip("> ").strip()
+        if not text or ATTRIBUTION.match(text):
+            return True
+        # Written by some other message of the thread (a hash lookup, not a scan of its bodies)
+        author = self.conversations[key].fresh_lines.get(text, email["id"])
+        return author != email["id"]
@@ -0,0 +1,169 @@
+import contextvars
+import json
+import secrets
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+_current_span = contextvars.ContextVar("triageflow_current_span", default=None)
+
+# OpenTelemetry GenAI semantic-convention attribute names
+INPUT_TOKENS = "gen_ai.usage.input_tokens"
+OUTPUT_TOKENS = "gen_ai.usage.output_tokens"
+MODEL = "gen_ai.request.model"
+CACHE_HIT = "triageflow.cache_hit"
+
+
+# Rough prompt-size estimate (~4 characters per token for English text)
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """~4 characters per token; used when the service does not report usage and to size batch prompts."""
+    return len(text) // CHARS_PER_TOKEN + 1 if text else 0
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def usage_of(function_result):
+    """(prompt_tokens, completion_tokens) reported by the connector, or (None, None)."""
+    prompt = completion = None
+    for completion_metadata in (getattr(function_result, "metadata", None) or {}).get("metadata", []) or []:
+        usage = (completion_metadata or {}).get("usage")
+        if usage is not None:
+            prompt = (prompt or 0) + (getattr(usage, "prompt_tokens", 0) or 0)
+            completion = (completion or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+    return prompt, completion
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name, trace_id, span_id, parent_id, start_ns, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns = None
+        self.attributes = attributes
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class Tracer:
+    """In-process span recorder with rolling per-stage latency percentiles.
+
+    Spans nest through a context variable, so a stage started inside an
+    asyncio task is parented to the pipeline span that created the task.
+    Finished spans are kept in a bounded buffer and can be exported as
+    OTLP/JSON (the OpenTelemetry file format) for any OTel-compatible viewer.
+    """
+
+    def __init__(self, service_name="triageflow", max_spans=5000, window=500):
+        self.service_name = service_name
+        self.window = window
+        self.spans = deque(maxlen=max_spans)
+        self._durations = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        parent = _current_span.get()
+        span = Span(
+            name,
+            parent.trace_id if parent else secrets.token_hex(16),
+            secrets.token_hex(8),
+            parent.span_id if parent else None,
+            time.time_ns(),
+            attributes,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as exc:
+            span.attributes["error"] = repr(exc)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self._finish(span)
+
+    def record(self, name, start_ns, end_ns, **attributes):
+        """Adds an already-measured span (e.g. a whole Streamlit rerun)."""
+        span = Span(name, secrets.token_hex(16), secrets.token_hex(8), None, start_ns, attributes)
+        span.end_ns = end_ns
+        self._finish(span)
+
+    def _finish(self, span):
+        with self._lock:
+            self.spans.append(span)
+            self._durations.setdefault(span.name, deque(maxlen=self.window)).append(span.duration_ms)
+            totals = self._totals.setdefault(span.name, Counter())
+            totals["tokens"] += span.attributes.get(INPUT_TOKENS, 0) + span.attributes.get(OUTPUT_TOKENS, 0)
+            totals["cache_hits"] += bool(span.attributes.get(CACHE_HIT))
+
+    def stage_stats(self):
+        """{stage: {count, p50_ms, p95_ms, tokens, cache_hits}}; percentiles cover the last `window` spans."""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self._durations.items()}
+            totals = {name: dict(counter) for name, counter in self._totals.items()}
+        stats = {}
+        for name, values in sorted(snapshot.items()):
+            stats[name] = {"count": len(values), "p50_ms": round(percentile(values, 50), 1),
+                           "p95_ms": round(percentile(values, 95), 1), **totals[name]}
+        return stats
+
+    def to_otlp(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "triageflow.tracing"},
+                "spans": [{
+                    "traceId": s.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": 1,
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.end_ns),
+                    "attributes": [_attribute(k, v) for k, v in s.attributes.items() if v is not None],
+                    "status": {"code": 2 if "error" in s.attributes else 1},
+                } for s in spans],
+            }],
+        }]}
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_otlp(), f)
+        return path
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+# Process-wide tracer shared by app.py, main.py and the LLM cache layer
+tracer = Tracer()
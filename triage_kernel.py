@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+
+from batch_classify import batch_prompt
+from llm_client import llm_client, pool_connections
+
+PLUGIN_NAME = "TriagePlugin"
+
+# --- PROMPT TEMPLATES (shared by app.py and main.py) ---
+CLASSIFY_RULES = """Rules:
+        - Sales/Marketing -> 'Spam'
+        - Informational/No Task -> 'FYI'
+        - Casual/No Deadline -> 'Low'
+        - Deadline/Crisis/Approval -> 'High'
+        Return ONLY: "Urgency: [High/Low] | Intent: [Action/FYI/Spam]" """
+
+PROMPTS = {
+    # 1. CLASSIFIER
+    "ClassifyEmail": "Analyze email. Subject: {{$subject}} Body: {{$body}}. \n        " + CLASSIFY_RULES,
+    # 1b. BATCH CLASSIFIER (same rules, many emails per call)
+    "BatchClassify": batch_prompt(CLASSIFY_RULES),
+    # 2. DRAFTER
+    "DraftReply": "Exec Asst. Email: {{$body}} Context: {{$context}} Draft reply in STYLE: {{$style}}.",
+    # 3. REFINER
+    "RefineDraft": "Rewrite this draft based on feedback. \nOriginal: {{$previous_draft}}\nEarlier feedback (keep applying it): {{$earlier_feedback}}\nFeedback: {{$feedback}}\nNew Draft:",
+    # 4. DELEGATOR
+    "ExtractTask": "Extract task: {{$body}}. Format: 'Task: [Action] | Who: [Role] | Due: [Time]'",
+}
+
+
+def get_deployment_name():
+    """The deployment that answers calls, as used in LLM cache keys and trace spans.
+
+    With TRIAGEFLOW_MOCK_LLM set it is "mock:<name>", so canned answers never
+    share cache entries with the real deployment.
+    """
+    name = os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o")
+    return f"mock:{name}" if os.getenv("TRIAGEFLOW_MOCK_LLM") else name
+
+
+class TriageFunction:
+    """A TriagePlugin prompt that only builds the kernel when it is first invoked.
+
+    `name` and `template` are all the LLM cache needs to key a call, so runs
+    answered from the cache never import the SDK. Arguments are plain dicts.
+    Every call goes through the shared llm_client (rate limit, retries, hedging).
+    """
+
+    def __init__(self, name, template):
+        self.name = name
+        self.template = template
+
+    def resolve(self):
+        return get_kernel().plugins[PLUGIN_NAME][self.name]
+
+    async def invoke(self, arguments):
+        kernel = await _kernel_off_loop()
+        function, kernel_arguments = self.resolve(), _kernel_arguments(arguments)
+        return await llm_client.call(self.name, lambda: kernel.invoke(function, kernel_arguments))
+
+    async def invoke_stream(self, arguments):
+        kernel = await _kernel_off_loop()
+        function, kernel_arguments = self.resolve(), _kernel_arguments(arguments)
+        async for update in llm_client.stream(self.name, lambda: kernel.invoke_stream(function, kernel_arguments)):
+            yield update
+
+
+FUNCTIONS = {name: TriageFunction(name, template) for name, template in PROMPTS.items()}
+
+
+def triage_function(name):
+    return FUNCTIONS[name]
+
+
+_kernel = None
+_kernel_lock = threading.Lock()
+
+
+def get_kernel():
+    """The process-wide kernel, built on first use: one connector plus every TriagePlugin prompt, compiled once."""
+    global _kernel
+    if _kernel is None:
+        with _kernel_lock:
+            if _kernel is None:
+                _kernel = _build_kernel()
+    return _kernel
+
+
+async def _kernel_off_loop():
+    # The first build imports the SDK (seconds); do it in a thread so the event loop keeps serving other tasks
+    return _kernel if _kernel is not None else await asyncio.to_thread(get_kernel)
+
+
+def _build_kernel():
+    # Deferred imports: semantic_kernel and its OpenAI connector dominate cold start
+    import semantic_kernel as sk
+
+    kernel = sk.Kernel()
+    if os.getenv("TRIAGEFLOW_MOCK_LLM"):
+        # Offline stand-in for benchmarks and demos without Azure credentials
+        from mock_llm import MockChatCompletion
+        kernel.add_service(MockChatCompletion.from_env(service_id="default"))
+    else:
+        from semantic_kernel.connectors.ai.open_ai import AzureChatCompletion
+        service = AzureChatCompletion(
+            service_id="default",
+            deployment_name=get_deployment_name(),
+            endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            api_key=os.getenv("AZURE_OPENAI_KEY")
+        )
+        # One keep-alive connection pool for every prompt; its response headers feed the rate limiter
+        service.client = pool_connections(service.client, llm_client.limiter)
+        kernel.add_service(service)
+    for name, template in PROMPTS.items():
+        kernel.add_function(prompt=template, function_name=name, plugin_name=PLUGIN_NAME)
+    return kernel
+
+
+def _kernel_arguments(arguments):
+    from semantic_kernel.functions import KernelArguments
+    return KernelArguments(**arguments)